@@ -1,10 +1,15 @@
 import argparse
 import logging
 import sys
+from modules import bg, merge
 from modules.bg import add_background_music
 from modules.drive import upload_to_drive
+from modules.jobs import JobQueue, start_local_workers, stop_local_workers
 from modules.labs import process_labs
 from modules.merge import merge_videos, cleanup_title_video
+from modules.profiles import add_profile_argument, set_profile
+from modules.progress import set_console_progress
+from modules.trace import finish_trace, span, start_trace
 from modules.title import convert_titles
 
 # Global debug flag
@@ -61,9 +66,79 @@ def main():
     parser.add_argument(
         "--debug", action="store_true", help="Enable verbose debug output"
     )
+    parser.add_argument(
+        "--workers", type=int, help="Number of pieces to normalize in parallel (0 = auto, default: 1)"
+    )
+    parser.add_argument(
+        "--threads", type=int, help="FFmpeg threads per normalization job (default: CPU count / workers)"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Do not use the persistent cache of normalized clips"
+    )
+    parser.add_argument(
+        "--reencode-concat", action="store_true", help="Always re-encode when concatenating instead of stream-copying"
+    )
+    parser.add_argument(
+        "--single-pass", action="store_true", help="Normalize and concatenate in one FFmpeg encode (no intermediates)"
+    )
+    parser.add_argument(
+        "--screen", action="store_true", help="Screen-content mode: drop duplicate frames, variable frame rate"
+    )
+    parser.add_argument(
+        "--incremental", action="store_true", help="Rebuild an existing article, re-encoding only changed segments"
+    )
+    parser.add_argument(
+        "--chunks", type=int, help="Re-encode long timelines as N parallel chunks (0 = CPU count, default: 1)"
+    )
+    parser.add_argument(
+        "--asset-jobs", type=int, help="Missing assets to build in parallel for an article (0 = auto, default: 0)"
+    )
+    parser.add_argument(
+        "--music-in-merge", action="store_true", help="Mix background music in during the final merge encode"
+    )
+    parser.add_argument(
+        "--jobs-dir", type=str, help="Shared job directory: run encodes on workers (python -m modules.jobs)"
+    )
+    parser.add_argument(
+        "--local-workers", type=int, default=0, help="Start N workers on this machine for --jobs-dir"
+    )
+    parser.add_argument(
+        "--scratch-dir", type=str, help="Directory for per-job intermediate files (default: ./pieces/trash)"
+    )
+    parser.add_argument(
+        "--tmpfs", action="store_true", help="Keep intermediate files in RAM (/dev/shm) instead of on disk"
+    )
+    parser.add_argument(
+        "--scratch-quota", type=float, help="GB of scratch space shared by all running jobs (default: 50)"
+    )
+    parser.add_argument(
+        "--trace", type=str, help="Append timing spans to this JSON-lines file (Chrome trace written next to it)"
+    )
+    parser.add_argument(
+        "--no-progress", action="store_true", help="Do not show live FFmpeg progress (fps, speed, size, ETA)"
+    )
+    add_profile_argument(parser)
 
     args = parser.parse_args()
     DEBUG_MODE = args.debug
+    set_profile(args.profile)
+    if args.no_progress:
+        set_console_progress(False)
+    if args.trace:
+        start_trace(args.trace)
+
+    local_workers = []
+    if args.jobs_dir:
+        queue = JobQueue(args.jobs_dir)
+        merge.set_job_queue(queue)
+        bg.set_job_queue(queue)
+        if args.local_workers:
+            local_workers = start_local_workers(
+                queue.jobs_dir, args.local_workers, root=queue.root, threads=args.threads
+            )
+        logger.info(f"Distributing encodes through {queue.jobs_dir} ({args.local_workers} local workers)")
+        if args.tmpfs:
+            logger.warning("--tmpfs scratch files are only visible to workers on this machine")
 
     try:
         # Validate IDs
@@ -74,7 +149,8 @@ def main():
             print_status("🔄 Running AI voiceover generation...", debug_only=True)
             logger.info("Running labs script only...")
             try:
-                process_labs(args)
+                with span("labs"):
+                    process_labs(args)
                 print_status("✅ AI voiceover generation completed", debug_only=True)
                 logger.info("Labs script completed successfully.")
             except Exception as e:
@@ -89,7 +165,8 @@ def main():
                 print_status("📝 Converting title slides...")
                 logger.info("Step 1: Converting titles...")
                 try:
-                    convert_titles(args)
+                    with span("titles"):
+                        convert_titles(args)
                     print_status("✅ Title slides converted", debug_only=True)
                     logger.info("Title conversion completed successfully.")
                 except FileNotFoundError as e:
@@ -106,7 +183,8 @@ def main():
                 print_status("🎬 Merging video pieces...")
                 logger.info("Step 2: Merging videos...")
                 try:
-                    merge_success = merge_videos(args)
+                    with span("merge"):
+                        merge_success = merge_videos(args)
                     if merge_success:
                         print_status("✅ Videos merged successfully", debug_only=True)
                         logger.info("Video merging completed successfully.")
@@ -115,7 +193,8 @@ def main():
                         if args.assets:
                             print_status("🧹 Cleaning up temporary files...", debug_only=True)
                             logger.info("Cleaning up title video...")
-                            cleanup_success = cleanup_title_video(args.assets, logger)
+                            with span("cleanup"):
+                                cleanup_success = cleanup_title_video(args.assets, logger)
                             if cleanup_success:
                                 print_status("✅ Temporary files cleaned up", debug_only=True)
                                 logger.info("Title video cleanup completed successfully.")
@@ -138,7 +217,8 @@ def main():
                 print_status("🎵 Adding background music...")
                 logger.info("Step 3: Adding background music...")
                 try:
-                    add_background_music(args)
+                    with span("background music"):
+                        add_background_music(args)
                     print_status("✅ Background music added", debug_only=True)
                     logger.info("Background music added successfully.")
                 except FileNotFoundError as e:
@@ -155,7 +235,8 @@ def main():
                 print_status("☁️ Uploading to Google Drive...")
                 logger.info("Step 4: Uploading to Google Drive...")
                 try:
-                    upload_to_drive(args)
+                    with span("upload"):
+                        upload_to_drive(args)
                     print_status("✅ Upload completed successfully", debug_only=True)
                     logger.info("Upload to Google Drive completed successfully.")
                 except FileNotFoundError as e:
@@ -176,6 +257,9 @@ def main():
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
         sys.exit(1)
+    finally:
+        stop_local_workers(local_workers)
+        finish_trace()
 
 if __name__ == "__main__":
     main()
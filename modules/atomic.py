@@ -0,0 +1,180 @@
+import ctypes
+import json
+import os
+import shutil
+import sys
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from modules.cache import file_hash
+from modules.probe import ProbeError, forget, moved, probe
+
+# Import debug mode from main
+try:
+    from main import DEBUG_MODE
+except ImportError:
+    DEBUG_MODE = False
+
+def debug_print(message):
+    """Print message only in debug mode."""
+    if DEBUG_MODE:
+        print(message)
+
+FICLONE = 0x40049409  # Linux ioctl that shares a file's blocks copy-on-write (btrfs, XFS, bcachefs)
+
+
+def temp_output_path(output_file):
+    """
+    Return a unique temporary path next to output_file with the same extension,
+    so ffmpeg picks the right container. Rename it with commit_output() when done.
+    """
+    directory, name = os.path.split(os.path.abspath(output_file))
+    base, ext = os.path.splitext(name)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f".{base}.{uuid.uuid4().hex[:8]}.partial{ext}")
+
+
+def discard_temp(temp_file):
+    """Remove a temporary output left behind by a failed or interrupted write and forget its probe result."""
+    if not temp_file:
+        return
+    if os.path.exists(temp_file):
+        os.remove(temp_file)
+    forget(temp_file)
+
+
+def marker_path(output_file):
+    """Return the path of the completion marker for an output."""
+    return f"{output_file}.done.json"
+
+
+def probe_summary(video_file):
+    """Return a compact description of a file's duration and streams for completion markers."""
+    data = probe(video_file)
+    keys = ("codec_type", "codec_name", "width", "height", "pix_fmt", "r_frame_rate", "sample_rate", "channels")
+    return {
+        "duration": float(data["format"].get("duration", 0.0)),
+        "streams": [{key: stream[key] for key in keys if key in stream} for stream in data["streams"]],
+    }
+
+
+def write_marker(output_file, extra=None):
+    """
+    Record that output_file is complete, with its hash, size, mtime and probe summary,
+    plus any extra fields describing how it was made.
+    """
+    stat = os.stat(output_file)
+    marker = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": file_hash(output_file),
+        "probe": probe_summary(output_file),
+        **(extra or {}),
+    }
+    tmp_path = f"{marker_path(output_file)}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(marker, f, indent=4)
+    os.replace(tmp_path, marker_path(output_file))
+
+
+def commit_output(temp_file, output_file, extra=None):
+    """
+    Atomically move a finished temporary output into place and write its completion marker
+    (with the extra fields, see write_marker). Returns False, leaving output_file untouched, if the temporary file is not readable media.
+    """
+    try:
+        probe(temp_file)  # Never publish a file ffprobe cannot read
+    except ProbeError as e:
+        debug_print(f"❌ Not publishing {output_file}: {e}")
+        forget(temp_file)
+        return False
+    os.replace(temp_file, output_file)
+    moved(temp_file, output_file)  # The marker reuses the probe result of the temporary file
+    write_marker(output_file, extra)
+    return True
+
+
+def read_marker(output_file):
+    """Return the completion marker of output_file, or None if it is missing or does not match the file."""
+    try:
+        stat = os.stat(output_file)
+        with open(marker_path(output_file), "r") as f:
+            marker = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if marker.get("size") == stat.st_size and marker.get("mtime_ns") == stat.st_mtime_ns:
+        return marker
+    return None
+
+
+def _reflink(source_file, output_file):
+    """
+    Create output_file as a copy-on-write clone of source_file (APFS on macOS, FICLONE on Linux).
+    Returns False, leaving no file behind, if the filesystem does not support it.
+    """
+    if sys.platform == "darwin":
+        try:
+            clonefile = ctypes.CDLL(None, use_errno=True).clonefile
+        except (OSError, AttributeError):
+            return False
+        return clonefile(os.fsencode(source_file), os.fsencode(output_file), 0) == 0
+    if fcntl is None or not sys.platform.startswith("linux"):
+        return False
+    try:
+        with open(source_file, "rb") as source, open(output_file, "wb") as output:
+            fcntl.ioctl(output.fileno(), FICLONE, source.fileno())
+        shutil.copystat(source_file, output_file)
+        return True
+    except OSError:
+        discard_temp(output_file)
+        return False
+
+
+def clone_atomic(source_file, output_file):
+    """
+    Make output_file a copy of source_file as cheaply as the filesystem allows: a reflink clone,
+    else a hard link, else a full copy. Returns the method used ("reflink", "hardlink" or "copy").
+    A hard link shares the file itself; it stays an unchanged copy because pipeline outputs are
+    never modified in place, only replaced by renaming a new file over them (see commit_output).
+    """
+    temp_file = temp_output_path(output_file)
+    try:
+        if _reflink(source_file, temp_file):
+            method = "reflink"
+        else:
+            try:
+                os.link(source_file, temp_file)
+                method = "hardlink"
+            except OSError:  # Other filesystem, or links not supported
+                shutil.copy2(source_file, temp_file)
+                method = "copy"
+        os.replace(temp_file, output_file)
+    finally:
+        discard_temp(temp_file)
+    return method
+
+
+def is_complete(output_file):
+    """
+    Check that output_file exists and was completely written.
+    A marker matching the file's size and mtime is trusted without reading the file.
+    Files without a matching marker (e.g. built before markers existed) are validated
+    with ffprobe and marked if they are readable media with a duration.
+    """
+    if not os.path.exists(output_file):
+        return False
+    if read_marker(output_file) is not None:
+        return True
+
+    try:
+        if probe_summary(output_file)["duration"] <= 0:
+            raise ProbeError("zero duration")
+    except (ProbeError, ValueError) as e:
+        debug_print(f"⚠️ {output_file} is incomplete or corrupted ({e}). It will be rebuilt.")
+        return False
+    write_marker(output_file)
+    return True
@@ -0,0 +1,367 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from modules import bg, merge, title
+from modules.index import get_pieces, natural_key
+from modules.probe import get_duration
+from modules.profiles import add_profile_argument, get_profile_name, set_profile
+from modules.progress import run_ffmpeg, set_console_progress
+
+# Import debug mode from main
+try:
+    from main import DEBUG_MODE
+except ImportError:
+    DEBUG_MODE = False
+
+def debug_print(message):
+    """Print message only in debug mode."""
+    if DEBUG_MODE:
+        print(message)
+
+# Benchmark results and the baseline they are compared against
+BENCH_DIR = "./bench"
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+REGRESSION_THRESHOLD = 0.10  # Fail when a stage is more than 10% slower than the baseline
+
+# Synthetic fixtures: slide-like video (a new frame every half second) at a size and frame rate
+# that differ from the pipeline target, so normalization does real work
+FIXTURE_SIZE = "1280x720"
+FIXTURE_FPS = 30
+FIXTURE_AUDIO_RATE = 48000
+ASSET_ID = "901"
+ARTICLE_ID = "900"
+TRANSCRIPT_GAP = 3.0  # seconds between fake transcript sentences
+STAGES = ["title", "normalize", "concatenate", "concatenate-reencode", "bg", "labs-audio", "full"]
+
+
+def make_fixture(command, output_file):
+    """Run an ffmpeg command that creates a fixture, raising RuntimeError if it fails."""
+    result = run_ffmpeg(command, label=f"fixture {os.path.basename(output_file)}")
+    if result.returncode != 0:
+        raise RuntimeError(f"Could not create fixture {output_file}:\n{result.stderr}")
+
+
+def screen_video(output_file, duration, audio):
+    """Create a screen-recording-like clip with a tone, a silent track or no audio (audio=None)."""
+    command = ["ffmpeg", "-y", "-f", "lavfi", "-i", f"testsrc2=size={FIXTURE_SIZE}:rate=2,fps={FIXTURE_FPS}"]
+    if audio == "tone":
+        command.extend(["-f", "lavfi", "-i", f"sine=frequency=440:sample_rate={FIXTURE_AUDIO_RATE}"])
+    elif audio == "silent":
+        command.extend(["-f", "lavfi", "-i", f"anullsrc=channel_layout=stereo:sample_rate={FIXTURE_AUDIO_RATE}"])
+    command.extend(["-t", str(duration), "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p"])
+    if audio:
+        command.extend(["-c:a", "aac", "-shortest"])
+    command.append(output_file)
+    make_fixture(command, output_file)
+
+
+def title_png(output_file):
+    """Create a 1920x1080 title image."""
+    make_fixture(
+        ["ffmpeg", "-y", "-f", "lavfi", "-i", "color=c=0x1e3a5f:s=1920x1080", "-frames:v", "1", output_file],
+        output_file,
+    )
+
+
+def tone(output_file, duration, frequency):
+    """Create an audio file with a sine tone."""
+    make_fixture(
+        ["ffmpeg", "-y", "-f", "lavfi", "-i", f"sine=frequency={frequency}:sample_rate=44100:duration={duration}",
+         output_file],
+        output_file,
+    )
+
+
+def fake_transcript(duration):
+    """Return Whisper-like segments: one short sentence every TRANSCRIPT_GAP seconds."""
+    segments = []
+    start = 0.0
+    while start + 1.0 < duration:
+        segments.append({"start": start, "end": start + 1.0, "text": f"This is sentence {len(segments) + 1}."})
+        start += TRANSCRIPT_GAP
+    return segments
+
+
+def create_fixtures(fixtures_dir, pieces, duration):
+    """
+    Create a project tree with title images, asset pieces (cycling through tone, silent
+    and missing audio), background music, a fake transcript and TTS-like clips.
+    """
+    for directory in ("pieces/title", "articles/title", "bg", "tts"):
+        os.makedirs(os.path.join(fixtures_dir, directory), exist_ok=True)
+    title_png(os.path.join(fixtures_dir, "pieces", "title", f"{ASSET_ID}.png"))
+    title_png(os.path.join(fixtures_dir, "articles", "title", f"{ARTICLE_ID}.png"))
+    for i in range(1, pieces + 1):
+        audio = ("tone", "silent", None)[(i - 1) % 3]
+        screen_video(os.path.join(fixtures_dir, "pieces", f"{ASSET_ID}_{i}.mp4"), duration, audio)
+    tone(os.path.join(fixtures_dir, "bg", "default.mp3"), duration * pieces + 10, 220)
+
+    transcript = fake_transcript(duration)
+    with open(os.path.join(fixtures_dir, "transcript.json"), "w") as f:
+        json.dump(transcript, f, indent=4)
+    for segment in transcript:
+        tone(os.path.join(fixtures_dir, "tts", f"tts_{segment['start']:.2f}.m4a"), 1.0, 660)
+
+
+def fixture_pieces(fixtures_dir):
+    """Return the asset piece fixtures in order."""
+    return get_pieces(os.path.join(fixtures_dir, "pieces"), ASSET_ID)
+
+
+def require(ok, stage):
+    if not ok:
+        raise RuntimeError(f"Stage '{stage}' failed")
+
+
+def bench_title(fixtures_dir, work_dir):
+    output_file = os.path.join(work_dir, f"{ASSET_ID}_0.mp4")
+    title.create_video(os.path.join(fixtures_dir, "pieces", "title", f"{ASSET_ID}.png"), output_file)
+    require(os.path.exists(output_file), "title")
+    return title.DURATION
+
+
+def bench_normalize(fixtures_dir, work_dir):
+    media_seconds = 0.0
+    for i, piece in enumerate(fixture_pieces(fixtures_dir)):
+        require(merge.normalize_video(piece, os.path.join(work_dir, f"normalized_{i}.mp4")), "normalize")
+        media_seconds += get_duration(piece)
+    return media_seconds
+
+
+def normalized_fixtures(fixtures_dir):
+    """Normalize the pieces once for the concatenation stages (not timed)."""
+    normalized_dir = os.path.join(fixtures_dir, "normalized")
+    if not os.path.isdir(normalized_dir):
+        os.makedirs(normalized_dir)
+        bench_normalize(fixtures_dir, normalized_dir)
+    return sorted(
+        (os.path.join(normalized_dir, name) for name in os.listdir(normalized_dir) if name.endswith(".mp4")),
+        key=natural_key,
+    )
+
+
+def bench_concatenate(fixtures_dir, work_dir, fast_concat=True):
+    normalized_files = normalized_fixtures(fixtures_dir)
+    output_file = os.path.join(work_dir, f"{ASSET_ID}.mp4")
+    require(merge.concatenate_videos(normalized_files, output_file, ASSET_ID, fast_concat=fast_concat), "concatenate")
+    return get_duration(output_file)
+
+
+def bench_bg(fixtures_dir, work_dir):
+    # process_media writes assets/<id>.mp4 to frappe/<id>.mp4
+    assets_dir = os.path.join(work_dir, "assets")
+    os.makedirs(assets_dir)
+    asset_file = os.path.join(assets_dir, f"{ASSET_ID}.mp4")
+    shutil.copy2(normalized_fixtures(fixtures_dir)[0], asset_file)
+    ok, message = bg.process_media(asset_file, os.path.join(fixtures_dir, "bg", "default.mp3"))
+    require(ok, f"bg ({message})")
+    return get_duration(asset_file)
+
+
+def bench_labs_audio(fixtures_dir, work_dir):
+    from modules.labs import build_voiceover_audio, group_segments_by_pause, merge_voiceover, split_group_into_sentences
+
+    with open(os.path.join(fixtures_dir, "transcript.json"), "r") as f:
+        transcript = json.load(f)
+    sentences = []
+    for group in group_segments_by_pause(transcript, max_gap=0.5):
+        sentences.extend(split_group_into_sentences(group, pause_threshold=2.0))
+    clips = [
+        (segment["start"], os.path.join(fixtures_dir, "tts", f"tts_{segment['start']:.2f}.m4a"))
+        for segment in sentences
+    ]
+    video = fixture_pieces(fixtures_dir)[0]
+    audio_file = os.path.join(work_dir, "voiceover.mp3")
+    build_voiceover_audio(clips, audio_file, duration=get_duration(video))
+    merge_voiceover(video, audio_file, os.path.join(work_dir, "labs.mp4"))
+    return get_duration(video)
+
+
+def bench_full(fixtures_dir, work_dir, profile):
+    """Run main.py for an article with one asset in a copy of the code and fixtures."""
+    app_dir = os.path.join(work_dir, "app")
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    shutil.copytree(fixtures_dir, app_dir, ignore=shutil.ignore_patterns("normalized", "tts", "transcript.json"))
+    shutil.copy2(os.path.join(repo_dir, "main.py"), app_dir)
+    shutil.copytree(os.path.join(repo_dir, "modules"), os.path.join(app_dir, "modules"),
+                    ignore=shutil.ignore_patterns("__pycache__"))
+    command = [
+        sys.executable,
+        "main.py",
+        f"--articles={ARTICLE_ID},{ASSET_ID}",
+        "--no-cache",
+        "--no-progress",
+        "--profile",
+        profile,
+    ]
+    # Answer any "Press Enter to continue" prompt
+    result = subprocess.run(command, cwd=app_dir, input="\n" * 10, capture_output=True, text=True)
+    output_file = os.path.join(app_dir, "articles", f"{ARTICLE_ID}.mp4")
+    if result.returncode != 0 or not os.path.exists(output_file):
+        raise RuntimeError(f"main.py failed:\n{result.stdout}\n{result.stderr}")
+    return get_duration(output_file)
+
+
+def run_stage(stage, fixtures_dir, scratch_dir, profile):
+    """Run one stage in a fresh directory. Returns (wall seconds, media seconds produced)."""
+    work_dir = tempfile.mkdtemp(prefix=f"{stage}_", dir=scratch_dir)
+    try:
+        started = time.perf_counter()
+        if stage == "title":
+            media_seconds = bench_title(fixtures_dir, work_dir)
+        elif stage == "normalize":
+            media_seconds = bench_normalize(fixtures_dir, work_dir)
+        elif stage == "concatenate":
+            media_seconds = bench_concatenate(fixtures_dir, work_dir)
+        elif stage == "concatenate-reencode":
+            media_seconds = bench_concatenate(fixtures_dir, work_dir, fast_concat=False)
+        elif stage == "bg":
+            media_seconds = bench_bg(fixtures_dir, work_dir)
+        elif stage == "labs-audio":
+            media_seconds = bench_labs_audio(fixtures_dir, work_dir)
+        elif stage == "full":
+            media_seconds = bench_full(fixtures_dir, work_dir, profile)
+        else:
+            raise ValueError(f"Unknown stage '{stage}'")
+        return time.perf_counter() - started, media_seconds
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def ffmpeg_version():
+    try:
+        return subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True).stdout.splitlines()[0]
+    except (OSError, IndexError):
+        return None
+
+
+def run_benchmarks(stages, repeat, pieces, duration, work_root):
+    """Create fixtures in work_root, time every stage repeat times and return the results dict."""
+    fixtures_dir = os.path.join(work_root, "fixtures")
+    print(f"🧪 Creating fixtures ({pieces} pieces of {duration}s)...")
+    create_fixtures(fixtures_dir, pieces, duration)
+
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "ffmpeg": ffmpeg_version(),
+        "profile": get_profile_name(),
+        "settings": {"pieces": pieces, "duration": duration, "repeat": repeat},
+        "stages": {},
+    }
+    for stage in stages:
+        runs = []
+        media_seconds = 0.0
+        try:
+            for _ in range(repeat):
+                wall, media_seconds = run_stage(stage, fixtures_dir, work_root, get_profile_name())
+                runs.append(wall)
+        except ImportError as e:
+            print(f"⏭️ Skipping {stage}: {e}")
+            results["stages"][stage] = {"skipped": str(e)}
+            continue
+        median = statistics.median(runs)
+        results["stages"][stage] = {
+            "runs": runs,
+            "median": median,
+            "min": min(runs),
+            "media_seconds": media_seconds,
+            "speed": media_seconds / median if median else None,
+        }
+        print(f"⏱️ {stage}: {median:.2f}s median ({media_seconds / median:.1f}x realtime)")
+    return results
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Print results next to the baseline. Returns the names of stages that regressed."""
+    if baseline.get("settings") != results["settings"] or baseline.get("profile") != results["profile"]:
+        print("⚠️ Baseline was recorded with different settings or profile; comparison is approximate.")
+    regressions = []
+    print(f"{'stage':<22} {'baseline s':>11} {'current s':>10} {'change':>8}")
+    for stage, current in results["stages"].items():
+        previous = baseline.get("stages", {}).get(stage, {})
+        if "median" not in current or "median" not in previous:
+            print(f"{stage:<22} {'-':>11} {current.get('median', 0):>10.2f} {'n/a':>8}")
+            continue
+        change = (current["median"] - previous["median"]) / previous["median"]
+        marker = ""
+        if change > threshold:
+            regressions.append(stage)
+            marker = " ❌"
+        elif change < -threshold:
+            marker = " ✅"
+        print(f"{stage:<22} {previous['median']:>11.2f} {current['median']:>10.2f} {change:>+7.1%}{marker}")
+    return regressions
+
+
+def write_json(data, output_file):
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    with open(output_file, "w") as f:
+        json.dump(data, f, indent=4)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages on synthetic media")
+    parser.add_argument("--stages", type=str, help=f"Comma-separated stages (default: all of {','.join(STAGES)})")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the median is reported (default: 3)")
+    parser.add_argument("--pieces", type=int, default=3, help="Number of asset pieces (default: 3)")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per piece (default: 10)")
+    parser.add_argument("--output", type=str, help="Results file (default: bench/results/<timestamp>.json)")
+    parser.add_argument("--baseline", type=str, default=BASELINE_FILE, help=f"Baseline file (default: {BASELINE_FILE})")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument(
+        "--threshold", type=float, default=REGRESSION_THRESHOLD,
+        help="Slowdown that counts as a regression (default: 0.10 = 10%%)",
+    )
+    parser.add_argument("--keep", action="store_true", help="Keep the fixture directory")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    set_profile(args.profile)
+    set_console_progress(False)
+
+    stages = [stage.strip() for stage in args.stages.split(",")] if args.stages else STAGES
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(unknown)}")
+
+    repo_dir = os.getcwd()
+    work_root = tempfile.mkdtemp(prefix="qh-bench-")
+    os.chdir(work_root)  # Keep the pipeline's ./cache and scratch files out of the project
+    try:
+        results = run_benchmarks(stages, args.repeat, args.pieces, args.duration, work_root)
+    finally:
+        os.chdir(repo_dir)
+        if args.keep:
+            print(f"📁 Fixtures kept in {work_root}")
+        else:
+            shutil.rmtree(work_root, ignore_errors=True)
+
+    output_file = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d_%H%M%S')}.json")
+    write_json(results, output_file)
+    print(f"✅ Results written to {output_file}")
+
+    exit_code = 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"❌ Slower than baseline: {', '.join(regressions)}")
+            exit_code = 1
+    else:
+        print(f"ℹ️ No baseline at {args.baseline}. Run with --save-baseline to store one.")
+    if args.save_baseline:
+        write_json(results, args.baseline)
+        print(f"📌 Saved baseline to {args.baseline}")
+    sys.exit(exit_code)
@@ -1,9 +1,20 @@
 import argparse
+import glob
+import json
 import os
 import shutil
 import sys
+import time
 import ffmpeg
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from modules.atomic import clone_atomic, commit_output, discard_temp, is_complete, read_marker, temp_output_path
+from modules.cache import CACHE_DIR, cache_key, cache_lookup, cache_path, cache_temp_path, evict, file_hash
+from modules.index import get_index, has_file, natural_key
+from modules.probe import ProbeError, get_duration, has_audio, probe
+from modules.profiles import aac_kwargs, add_profile_argument, get_profile_name, set_profile, x264_kwargs
+from modules.progress import run_ffmpeg
 
 # Import debug mode from main
 try:
@@ -16,6 +27,45 @@ def debug_print(message):
     if DEBUG_MODE:
         print(message)
 
+# Background track and how it is mixed under the video's own audio
+BG_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bg", "default.mp3")
+BG_VOLUME = 0.07
+FADE_DURATION = 5  # seconds of fade in and fade out
+
+# Pre-rendered beds: the track decoded once to PCM at the mix rate and volume, and cut to each video's length
+BED_CACHE_DIR = os.path.join(CACHE_DIR, "bg")
+BED_CACHE_MAX_BYTES = 2 * 1024 ** 3  # 2 GB
+BED_RATE = 44100
+BED_CHANNELS = 2
+
+# Retention of article backups (articles/backup/), applied whenever a backup is made
+BACKUP_RETENTION_DAYS = 30  # Remove backups older than this
+BACKUP_MAX_BYTES = 20 * 1024 ** 3  # Then remove the oldest backups while they take more than 20 GB
+
+JOB_QUEUE = None  # modules.jobs.JobQueue; when set, mixing runs on workers (see set_job_queue)
+BATCH_WORKERS = os.cpu_count() or 1  # Videos mixed at once in batch mode (each mix is mostly I/O and one audio encode)
+
+
+def set_job_queue(queue):
+    """Send background music mixing to workers through a modules.jobs.JobQueue (None = run locally)."""
+    global JOB_QUEUE
+    JOB_QUEUE = queue
+
+
+def run_process_media(file_path, bg_path, interactive=True):
+    """Run process_media locally, or on a worker when a job queue is set."""
+    if JOB_QUEUE is None:
+        return process_media(file_path, bg_path, interactive=interactive)
+    result = JOB_QUEUE.run(
+        "mix_audio",
+        input=JOB_QUEUE.to_shared(file_path),
+        bg=JOB_QUEUE.to_shared(bg_path),
+        settings={"profile": get_profile_name()},
+    )
+    if result.get("ok"):
+        return True, result["output"]
+    return False, result.get("error", "Worker task failed")
+
 def validate_video_integrity(file_path):
     """
     Check if the video can be read by FFmpeg.
@@ -23,93 +73,315 @@ def validate_video_integrity(file_path):
     """
     try:
         # Probe the video to check if it can be read
-        ffmpeg.probe(file_path)
+        probe(file_path)
         return True, "Video integrity check passed"
-    except ffmpeg.Error as e:
+    except ProbeError as e:
         return False, f"Video integrity check failed: {str(e)}. The input video may be corrupted."
 
-def process_media(file_path, bg_path, volume=0.07, fade_duration=5):
-    """Process a video file by adding background music with fade effects using FFmpeg."""
+def music_output_path(file_path):
+    """
+    Return (output path, backup path) for adding music to file_path: assets are written
+    to frappe/ (backup path None), articles are replaced in place after a backup.
+    """
+    if "assets" in file_path:
+        output_dir = os.path.join(os.path.dirname(os.path.dirname(file_path)), "frappe")
+        return os.path.join(output_dir, os.path.basename(file_path)), None
+    backup_dir = os.path.join(os.path.dirname(file_path), "backup")
+    return file_path, os.path.join(backup_dir, os.path.basename(file_path))
+
+
+def clone_record_path(backup_path):
+    """Return the path of the sidecar recording how a backup was made (see clone_atomic)."""
+    return f"{backup_path}.clone.json"
+
+
+def back_up(file_path, backup_path):
+    """Back up file_path to backup_path with clone_atomic and record the method used. Returns the method."""
+    method = clone_atomic(file_path, backup_path)
+    with open(clone_record_path(backup_path), "w") as f:
+        json.dump({"method": method}, f)
+    return method
+
+
+def backup_disk_usage(path, stat):
+    """
+    Return the bytes that deleting the backup at path would free. A hard-linked backup shares its
+    data with the live article, and so does a reflink clone of an article that is still unchanged
+    (same size and mtime, which the clone keeps); deleting those frees nothing. Full copies, and
+    backups without a clone record, count at full size.
+    """
+    if stat.st_nlink > 1:
+        return 0
+    try:
+        with open(clone_record_path(path), "r") as f:
+            method = json.load(f).get("method")
+    except (OSError, json.JSONDecodeError):
+        method = None
+    if method != "reflink":
+        return stat.st_size
+    try:
+        live = os.stat(os.path.join(os.path.dirname(os.path.dirname(path)), os.path.basename(path)))
+    except OSError:
+        return stat.st_size
+    if live.st_size == stat.st_size and live.st_mtime_ns == stat.st_mtime_ns:
+        return 0
+    return stat.st_size
+
+
+def prune_backups(backup_dir, keep=()):
+    """
+    Apply the backup retention policy to backup_dir: remove backups older than BACKUP_RETENTION_DAYS,
+    then the oldest ones while the rest take more than BACKUP_MAX_BYTES of disk space of their own
+    (see backup_disk_usage). Paths in keep are never
+    removed; sidecar files (markers, manifests) go with their video. Returns the number removed.
+    """
+    if not os.path.isdir(backup_dir):
+        return 0
+    keep = {os.path.abspath(path) for path in keep}
+    backups = []
+    with os.scandir(backup_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith(".mp4") and not entry.name.startswith(".") and entry.is_file():
+                path = os.path.abspath(entry.path)
+                stat = entry.stat()
+                # mtime is when the backed-up version was written (clones keep it); ctime changes
+                # whenever the file's metadata does, e.g. when the article gains or drops a hard link
+                backups.append((stat.st_mtime, backup_disk_usage(path, stat), path))
+
+    total = sum(size for _, size, _ in backups)
+    cutoff = time.time() - BACKUP_RETENTION_DAYS * 86400
+    removed = 0
+    for backed_up, size, path in sorted(backups):
+        if backed_up >= cutoff and total <= BACKUP_MAX_BYTES:
+            break
+        if path in keep:
+            continue
+        for file in [path, *glob.glob(f"{glob.escape(path)}.*.json")]:
+            try:
+                os.remove(file)
+            except OSError:
+                pass
+        total -= size
+        removed += 1
+        debug_print(f"🗑️ Removed old backup {path}")
+    return removed
+
+
+def fade_filter(video_duration, fade_duration=FADE_DURATION):
+    """Return the afade chain that fades the bed in at the start and out at the end of a video."""
+    return (
+        f"afade=type=in:start_time=0:duration={fade_duration},"
+        f"afade=type=out:start_time={video_duration - fade_duration:.3f}:duration={fade_duration}"
+    )
+
+
+def render_bed(command, output_file, label):
+    """Run an ffmpeg command that renders a bed into the cache. Returns True if successful."""
+    result = run_ffmpeg(command, label=label)
+    if result.returncode != 0:
+        debug_print(f"❌ FFmpeg Error while rendering {label}:\n{result.stderr}")
+        return False
+    return True
+
+
+def base_bed(bg_path, volume=BG_VOLUME):
+    """
+    Return the background track decoded to PCM at BED_RATE/BED_CHANNELS and turned down to volume.
+    Rendered once per track and volume into the bed cache; returns None on failure.
+    """
+    key = cache_key(bg_path, {"bed": "base", "volume": volume, "rate": BED_RATE, "channels": BED_CHANNELS})
+    cached = cache_lookup(BED_CACHE_DIR, key, ".wav")
+    if cached:
+        return cached
+
+    temp_file = cache_temp_path(BED_CACHE_DIR, key, ".wav")
+    try:
+        command = [
+            "ffmpeg",
+            "-y",
+            "-i",
+            bg_path,
+            "-vn",
+            "-af",
+            f"volume={volume}",
+            "-ac",
+            str(BED_CHANNELS),
+            "-ar",
+            str(BED_RATE),
+            "-c:a",
+            "pcm_s16le",
+            temp_file,
+        ]
+        if not render_bed(command, temp_file, f"bed {os.path.basename(bg_path)}"):
+            return None
+        final_file = cache_path(BED_CACHE_DIR, key, ".wav")
+        os.replace(temp_file, final_file)
+        return final_file
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
+def timed_bed(bg_path, video_duration, volume=BG_VOLUME, fade_duration=FADE_DURATION):
+    """
+    Return the bed for a video of video_duration seconds: base_bed() looped or cut to length, with fades.
+    Only PCM is read and written, so this is cheap; beds are cached by track hash, volume, fades and
+    duration, and the cache is evicted by size. Mixing then needs just a two-input amix.
+    Returns None on failure.
+    """
+    params = {
+        "bed": "timed",
+        "volume": volume,
+        "fade": fade_duration,
+        "duration": round(video_duration, 3),
+        "rate": BED_RATE,
+        "channels": BED_CHANNELS,
+    }
+    key = cache_key(bg_path, params)
+    cached = cache_lookup(BED_CACHE_DIR, key, ".wav")
+    if cached:
+        return cached
+
+    base = base_bed(bg_path, volume)
+    if base is None:
+        return None
+    temp_file = cache_temp_path(BED_CACHE_DIR, key, ".wav")
+    try:
+        command = [
+            "ffmpeg",
+            "-y",
+            "-stream_loop",
+            "-1",  # Repeat the track if the video is longer
+            "-i",
+            base,
+            "-t",
+            f"{video_duration:.3f}",
+            "-af",
+            fade_filter(video_duration, fade_duration),
+            "-c:a",
+            "pcm_s16le",
+            temp_file,
+        ]
+        if not render_bed(command, temp_file, f"bed {video_duration:.0f}s"):
+            return None
+        final_file = cache_path(BED_CACHE_DIR, key, ".wav")
+        os.replace(temp_file, final_file)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+    evict(BED_CACHE_DIR, BED_CACHE_MAX_BYTES, keep=[base, final_file])
+    return final_file
+
+
+def music_marker(source_file, bg_path, volume=BG_VOLUME, fade_duration=FADE_DURATION):
+    """
+    Describe how music was added to source_file, for the completion marker of the output,
+    so the music is never mixed in twice and unchanged outputs are not mixed again.
+    """
+    return {
+        "source_sha256": file_hash(source_file),
+        "bg_sha256": file_hash(bg_path),
+        "volume": volume,
+        "fade_duration": fade_duration,
+    }
+
+
+def process_media(file_path, bg_path, volume=BG_VOLUME, fade_duration=FADE_DURATION, interactive=True):
+    """
+    Process a video file by adding background music with fade effects using FFmpeg.
+    Invalid inputs wait for Enter when interactive; otherwise they just fail.
+    """
+    temp_path = None
     try:
         # Validate video integrity
         success, message = validate_video_integrity(file_path)
         if not success:
             debug_print(f"Error: {message}")
-            input("Press Enter to continue or Ctrl+C to exit...")
+            if interactive:
+                input("Press Enter to continue or Ctrl+C to exit...")
             return False, message
 
         # Check if background audio exists
         if not os.path.exists(bg_path):
             debug_print(f"Error: Background audio file not found: {bg_path}")
-            input("Press Enter to continue or Ctrl+C to exit...")
+            if interactive:
+                input("Press Enter to continue or Ctrl+C to exit...")
             return False, f"Missing background audio: {bg_path}"
 
-        # Get video duration using FFmpeg probe
-        probe = ffmpeg.probe(file_path)
-        video_duration = float(probe['format']['duration'])
+        # Get video duration (probe results are cached from the integrity check)
+        video_duration = get_duration(file_path)
+        video_has_audio = has_audio(file_path)
+
+        # Skip outputs that already have this music (e.g. mixed in during the merge).
+        # An article replaced in place with music must never be mixed again.
+        music = music_marker(file_path, bg_path, volume, fade_duration)
+        output_path, backup_path = music_output_path(file_path)
+        mixed = (read_marker(output_path) or {}).get("music")
+        if mixed and (backup_path or mixed == music):
+            debug_print(f"✅ {output_path} already has background music. Skipping.")
+            return True, output_path
 
         # Prepare output path and backup logic
-        if "assets" in file_path:
-            output_dir = os.path.join(os.path.dirname(os.path.dirname(file_path)), "frappe")
-            os.makedirs(output_dir, exist_ok=True)
-            output_path = os.path.join(output_dir, os.path.basename(file_path))
-        else:
-            backup_dir = os.path.join(os.path.dirname(file_path), "backup")
-            os.makedirs(backup_dir, exist_ok=True)
-            backup_path = os.path.join(backup_dir, os.path.basename(file_path))
+        if backup_path:
             try:
-                shutil.copy2(file_path, backup_path)
+                method = back_up(file_path, backup_path)
             except (shutil.Error, OSError) as e:
                 return False, f"Failed to back up {file_path} to {backup_path}: {str(e)}"
-            output_path = file_path
+            debug_print(f"💾 Backed up {file_path} ({method})")
+            prune_backups(os.path.dirname(backup_path), keep=[backup_path])
+
+        # Background audio trimmed or looped to the video duration, with fade effects and volume
+        bed_path = timed_bed(bg_path, video_duration, volume, fade_duration)
+        if bed_path is None:
+            return False, f"Could not render the background music bed from {bg_path}"
 
         # Build FFmpeg command
         # Input streams: video and background audio
         input_video = ffmpeg.input(file_path)
-        input_audio = ffmpeg.input(bg_path)
-
-        # Trim or loop background audio to match video duration
-        audio = input_audio.audio.filter('atrim', duration=video_duration)
-        if audio_duration := float(ffmpeg.probe(bg_path)['format']['duration']) < video_duration:
-            audio = audio.filter('aloop', loop=-1, size=2**31-1).filter('atrim', duration=video_duration)
-
-        # Apply fade effects and volume
-        audio = audio.filter('afade', type='in', start_time=0, duration=fade_duration)
-        audio = audio.filter('afade', type='out', start_time=video_duration-fade_duration, duration=fade_duration)
-        audio = audio.filter('volume', volume)
+        audio = ffmpeg.input(bed_path).audio
 
         # Mix original audio (if exists) with background audio
-        try:
-            # Check if video has audio
-            ffmpeg.probe(file_path, select_streams='a')
+        if video_has_audio:
             final_audio = ffmpeg.filter([input_video.audio, audio], 'amix', inputs=2, duration='longest')
-        except ffmpeg.Error:
+        else:
             # No original audio, use background audio only
             final_audio = audio
 
-        # Combine video and audio, write output
-        output = ffmpeg.output(
-            input_video.video, final_audio, output_path,
-            vcodec='libx264', acodec='aac',
-            **{'strict': 'experimental'}
-        )
-        
-        # Suppress FFmpeg output unless in debug mode
-        if DEBUG_MODE:
-            ffmpeg.run(output, overwrite_output=True)
-        else:
-            ffmpeg.run(output, overwrite_output=True, quiet=True)
+        # Combine video and audio, write to a temporary file (the article itself is still being read).
+        # Only the audio changes, so the video stream is copied as is; re-encode only if copying fails.
+        temp_path = temp_output_path(output_path)
+        for video_kwargs in ({'vcodec': 'copy', **aac_kwargs()}, x264_kwargs()):
+            output = ffmpeg.output(
+                input_video.video, final_audio, temp_path,
+                **video_kwargs,
+                **{'strict': 'experimental'}
+            )
+            result = run_ffmpeg(
+                ffmpeg.compile(output, overwrite_output=True),
+                label=f"music {os.path.basename(file_path)}",
+                duration=video_duration,
+            )
+            if result.returncode == 0:
+                break
+            debug_print(f"⚠️ Could not copy the video stream of {file_path}. Re-encoding it.")
+        if result.returncode != 0:
+            return False, f"FFmpeg error: {result.stderr.strip()}"
 
+        if not commit_output(temp_path, output_path, extra={"music": music}):
+            return False, f"FFmpeg produced an unreadable file for {file_path}"
         return True, output_path
-    except ffmpeg.Error as e:
-        return False, f"FFmpeg error: {str(e)}"
+    except ProbeError as e:
+        return False, f"Probe error: {str(e)}"
     except Exception as e:
         return False, str(e)
+    finally:
+        discard_temp(temp_path)
 
 def add_background_music(args):
     # Define paths relative to root
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    bg_path = os.path.join(base_dir, "bg", "default.mp3")
+    bg_path = BG_FILE
 
     # Process assets (single ID)
     if args.assets:
@@ -124,11 +396,11 @@ def add_background_music(args):
         assets_dir = os.path.join(base_dir, "assets")
         file_path = os.path.join(assets_dir, f"{asset_id}.mp4")
         if os.path.exists(file_path):
-                    success, result = process_media(file_path, bg_path)
-        debug_print(f"Asset {asset_id}: {'Processed as ' + result if success else 'Failed - ' + result}")
-    else:
-        debug_print(f"Error: Asset file not found: {file_path}")
-        input("Press Enter to continue or Ctrl+C to exit...")
+            success, result = run_process_media(file_path, bg_path)
+            debug_print(f"Asset {asset_id}: {'Processed as ' + result if success else 'Failed - ' + result}")
+        else:
+            debug_print(f"Error: Asset file not found: {file_path}")
+            input("Press Enter to continue or Ctrl+C to exit...")
 
     # Process articles (first ID only)
     if args.articles:
@@ -141,15 +413,120 @@ def add_background_music(args):
         articles_dir = os.path.join(base_dir, "articles")
         file_path = os.path.join(articles_dir, f"{article_id}.mp4")
         if os.path.exists(file_path):
-                    success, result = process_media(file_path, bg_path)
-        debug_print(f"Article {article_id}: {'Processed as ' + result if success else 'Failed - ' + result}")
-    else:
-        debug_print(f"Error: Article file not found: {file_path}")
-        input("Press Enter to continue or Ctrl+C to exit...")
+            success, result = run_process_media(file_path, bg_path)
+            debug_print(f"Article {article_id}: {'Processed as ' + result if success else 'Failed - ' + result}")
+        else:
+            debug_print(f"Error: Article file not found: {file_path}")
+            input("Press Enter to continue or Ctrl+C to exit...")
+
+def expand_videos(patterns):
+    """Return the videos matching a list of paths and glob patterns, without duplicates, in natural order."""
+    videos = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern), key=natural_key) if glob.has_magic(pattern) else [pattern]
+        for match in matches:
+            path = os.path.abspath(match)
+            if path not in videos:
+                videos.append(path)
+    return videos
+
+
+def assets_missing_music(base_dir):
+    """Return the videos in assets/ that have no complete version with music in frappe/."""
+    assets_dir = os.path.join(base_dir, "assets")
+    frappe_dir = os.path.join(base_dir, "frappe")
+    return [
+        os.path.join(assets_dir, name)
+        for name in get_index(assets_dir)["files"]
+        if name.endswith(".mp4")
+        and not (has_file(frappe_dir, name) and is_complete(os.path.join(frappe_dir, name)))
+    ]
+
+
+def batch_process(videos, bg_path=BG_FILE, workers=None):
+    """
+    Add background music to many videos with a pool of workers, without prompting.
+    A failure does not stop the batch. Returns a report with a result per video
+    (in input order) and the number of videos that succeeded and failed.
+    """
+    workers = max(1, min(workers or BATCH_WORKERS, len(videos) or 1))
+    print(f"🎵 Adding background music to {len(videos)} videos ({workers} at a time)...")
+    started = time.time()
+    if JOB_QUEUE is None and videos and os.path.exists(bg_path):
+        base_bed(bg_path)  # Decode the track once, before the workers all need it
+
+    def mix(video):
+        video_started = time.time()
+        if not os.path.exists(video):
+            ok, message = False, "File not found"
+        else:
+            try:
+                ok, message = run_process_media(video, bg_path, interactive=False)
+            except Exception as e:
+                ok, message = False, str(e)
+        result = {"input": video, "ok": ok, "seconds": round(time.time() - video_started, 2)}
+        result["output" if ok else "error"] = message
+        return result
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(mix, video): video for video in videos}
+        for future in as_completed(futures):
+            result = future.result()
+            results[result["input"]] = result
+            status = "✅" if result["ok"] else "❌"
+            debug_print(f"{status} {result['input']}: {result.get('output') or result.get('error')}")
+
+    report = {
+        "bg": bg_path,
+        "workers": workers,
+        "seconds": round(time.time() - started, 2),
+        "succeeded": sum(1 for result in results.values() if result["ok"]),
+        "failed": sum(1 for result in results.values() if not result["ok"]),
+        "results": [results[video] for video in videos],
+    }
+    return report
+
+
+def print_report(report):
+    """Print the summary of a batch run and the videos that failed."""
+    print(
+        f"🎵 Background music: {report['succeeded']} succeeded, {report['failed']} failed "
+        f"in {report['seconds']:.1f}s"
+    )
+    for result in report["results"]:
+        if not result["ok"]:
+            print(f"❌ {result['input']}: {result['error']}")
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Add background music to videos")
     parser.add_argument("--assets", type=str, help="Single asset ID (e.g., 1)")
     parser.add_argument("--articles", type=str, help="Comma-separated article IDs, only first used (e.g., 11,24,55,65)")
+    parser.add_argument(
+        "--files", type=str, nargs="+", help="Batch mode: videos or glob patterns (e.g., 'assets/*.mp4')"
+    )
+    parser.add_argument(
+        "--missing", action="store_true", help="Batch mode: every video in assets/ without a version in frappe/"
+    )
+    parser.add_argument(
+        "--workers", type=int, help=f"Videos to process at once in batch mode (default: {BATCH_WORKERS})"
+    )
+    parser.add_argument("--report", type=str, help="Write the batch report to this JSON file")
+    add_profile_argument(parser)
     args = parser.parse_args()
+    set_profile(args.profile)
+
+    if args.files or args.missing:
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        videos = expand_videos(args.files or [])
+        if args.missing:
+            videos.extend(video for video in assets_missing_music(base_dir) if video not in videos)
+        report = batch_process(videos, workers=args.workers)
+        print_report(report)
+        if args.report:
+            with open(args.report, "w") as f:
+                json.dump(report, f, indent=4)
+            print(f"📄 Report written to {args.report}")
+        sys.exit(1 if report["failed"] else 0)
     add_background_music(args)
@@ -0,0 +1,216 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+
+# Import debug mode from main
+try:
+    from main import DEBUG_MODE
+except ImportError:
+    DEBUG_MODE = False
+
+def debug_print(message):
+    """Print message only in debug mode."""
+    if DEBUG_MODE:
+        print(message)
+
+# Cache settings
+CACHE_DIR = "./cache"
+HASH_INDEX_FILE = os.path.join(CACHE_DIR, "hashes.json")
+HASH_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+
+class JsonStore:
+    """
+    A dict persisted as one JSON file (e.g. the probe, hash and directory indexes).
+    Lookups and updates only touch memory; flush() writes the file once, merged with entries
+    other processes saved meanwhile, and drops the entries `keep(key)` rejects (e.g. deleted files).
+    All stores are flushed at exit (see flush_stores).
+    """
+
+    def __init__(self, path, keep=None):
+        self.path = path
+        self.keep = keep
+        self.lock = threading.Lock()
+        self._data = None
+        self._changed = set()
+        self._removed = set()
+        _stores.append(self)
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _entries(self):
+        if self._data is None:
+            self._data = self._read()
+        return self._data
+
+    def get(self, key):
+        with self.lock:
+            return self._entries().get(key)
+
+    def set(self, key, value):
+        with self.lock:
+            self._entries()[key] = value
+            self._changed.add(key)
+            self._removed.discard(key)
+
+    def pop(self, key):
+        """Remove an entry and return its value, or None if there was none."""
+        with self.lock:
+            return self._pop(key)
+
+    def _pop(self, key):
+        value = self._entries().pop(key, None)
+        self._changed.discard(key)
+        self._removed.add(key)
+        return value
+
+    def pop_prefix(self, prefix):
+        """Remove all entries whose key starts with prefix."""
+        with self.lock:
+            for key in [key for key in self._entries() if key.startswith(prefix)]:
+                self._pop(key)
+
+    def move(self, old_key, new_key):
+        """Store the entry of old_key under new_key instead. Returns False if there was none."""
+        with self.lock:
+            value = self._pop(old_key)
+            if value is None:
+                return False
+            self._entries()[new_key] = value
+            self._changed.add(new_key)
+            self._removed.discard(new_key)
+            return True
+
+    def flush(self):
+        """Write the changes made in this process to disk, if there are any."""
+        with self.lock:
+            if not self._changed and not self._removed:
+                return
+            data = self._read()
+            for key in self._removed:
+                data.pop(key, None)
+            data.update({key: self._data[key] for key in self._changed})
+            if self.keep is not None:
+                data = {key: value for key, value in data.items() if self.keep(key)}
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+            self._data = data
+            self._changed.clear()
+            self._removed.clear()
+
+
+_stores = []
+
+
+def flush_stores():
+    """Write all JsonStore changes to disk. Runs at exit; long-running workers call it after each task."""
+    for store in _stores:
+        store.flush()
+
+
+atexit.register(flush_stores)
+
+# File hashes by path, remembered with the (size, mtime) they were computed for
+_hash_index = JsonStore(HASH_INDEX_FILE, keep=os.path.exists)
+
+
+def file_hash(path):
+    """
+    Return the SHA-256 of a file's contents.
+    Hashes are remembered by (path, size, mtime) so unchanged files are only read once.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    stamp = [stat.st_size, stat.st_mtime_ns]
+    entry = _hash_index.get(path)
+    if entry and entry["stamp"] == stamp:
+        return entry["sha256"]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    sha256 = digest.hexdigest()
+
+    _hash_index.set(path, {"stamp": stamp, "sha256": sha256})
+    return sha256
+
+
+def cache_key(source_file, params):
+    """
+    Build a cache key from the content hash of source_file and a dict of parameters.
+    """
+    payload = json.dumps({"source": file_hash(source_file), "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def cache_path(cache_dir, key, ext=".mp4"):
+    """Return the path of the cache entry for key."""
+    return os.path.abspath(os.path.join(cache_dir, f"{key}{ext}"))
+
+
+def cache_temp_path(cache_dir, key, ext=".mp4"):
+    """
+    Return a unique in-progress path for key. Rename it to cache_path() once complete.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    name = f"{key}.{os.getpid()}.{threading.get_ident()}.partial{ext}"
+    return os.path.abspath(os.path.join(cache_dir, name))
+
+
+def cache_lookup(cache_dir, key, ext=".mp4"):
+    """
+    Return the path of a cached entry, or None if missing.
+    A hit refreshes the entry's mtime so eviction is least-recently-used.
+    """
+    path = cache_path(cache_dir, key, ext)
+    if not os.path.exists(path):
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return path
+
+
+def evict(cache_dir, max_bytes, keep=()):
+    """
+    Delete least-recently-used entries until cache_dir is at most max_bytes.
+    Paths in keep are never deleted. Returns the number of bytes freed.
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+    keep = {os.path.abspath(p) for p in keep}
+    entries = []
+    total = 0
+    for name in os.listdir(cache_dir):
+        path = os.path.abspath(os.path.join(cache_dir, name))
+        if not os.path.isfile(path) or ".partial" in name:
+            continue
+        stat = os.stat(path)
+        total += stat.st_size
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    freed = 0
+    for _, size, path in sorted(entries):
+        if total - freed <= max_bytes:
+            break
+        if path in keep:
+            continue
+        try:
+            os.remove(path)
+            freed += size
+            debug_print(f"🗑️ Evicted cache entry {os.path.basename(path)}")
+        except OSError:
+            pass
+    return freed
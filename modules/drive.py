@@ -14,6 +14,8 @@ from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaFileUpload
 
+from modules.trace import span
+
 # Import debug mode from main
 try:
     from main import DEBUG_MODE
@@ -138,11 +140,12 @@ def upload_file(file_name, file_path, creds):
     service = build("drive", "v3", credentials=creds)
     file_metadata = {"name": file_name, "parents": [FOLDER_ID]}
     media = MediaFileUpload(file_path, mimetype="video/mp4")
-    file = (
-        service.files()
-        .create(body=file_metadata, media_body=media, fields="id")
-        .execute()
-    )
+    with span(f"drive upload {file_name}", "http", bytes=os.path.getsize(file_path)):
+        file = (
+            service.files()
+            .create(body=file_metadata, media_body=media, fields="id")
+            .execute()
+        )
     debug_print(f"Uploaded {file_name} - File ID: {file.get('id')}")
     return file.get("id")
 
@@ -153,8 +156,9 @@ def create_shareable_link(file_id, creds):
         "role": "reader",
         "type": "anyone",
     }
-    service.permissions().create(fileId=file_id, body=permission).execute()
-    file = service.files().get(fileId=file_id, fields="webViewLink").execute()
+    with span("drive share link", "http"):
+        service.permissions().create(fileId=file_id, body=permission).execute()
+        file = service.files().get(fileId=file_id, fields="webViewLink").execute()
     return file.get("webViewLink")
 
 def upload_to_drive(args):
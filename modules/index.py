@@ -0,0 +1,80 @@
+import os
+import re
+import time
+
+from modules.cache import CACHE_DIR, JsonStore
+
+# Import debug mode from main
+try:
+    from main import DEBUG_MODE
+except ImportError:
+    DEBUG_MODE = False
+
+def debug_print(message):
+    """Print message only in debug mode."""
+    if DEBUG_MODE:
+        print(message)
+
+# Directory listings are cached by directory mtime, in memory and on disk
+INDEX_CACHE_FILE = os.path.join(CACHE_DIR, "index.json")
+# A listing taken less than this long after the directory changed may have missed a change
+# made within the same mtime tick, so it is only trusted once the directory is older than this
+MTIME_SLACK_NS = 2 * 10 ** 9
+
+_index_cache = JsonStore(INDEX_CACHE_FILE, keep=os.path.isdir)
+
+
+def natural_key(name):
+    """Sort key that orders numbers by value, so 45_2.mp4 comes before 45_10.mp4."""
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]
+
+
+def _build_index(directory):
+    """List directory once and group its videos by ID."""
+    files = []
+    groups = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            # Skip hidden files (including in-progress .partial outputs) and subdirectories
+            if entry.name.startswith(".") or not entry.is_file():
+                continue
+            files.append(entry.name)
+            base, ext = os.path.splitext(entry.name)
+            if ext == ".mp4" and "_" in base:
+                groups.setdefault(base.split("_", 1)[0], []).append(entry.name)
+    for names in groups.values():
+        names.sort(key=natural_key)
+    return {"files": sorted(files, key=natural_key), "groups": groups}
+
+
+def get_index(directory):
+    """
+    Return the index of a directory: {"files": [...], "groups": {id: [<id>_<n>.mp4, ...]}},
+    with names in natural order. The directory is only listed again after its mtime changes.
+    """
+    path = os.path.abspath(directory)
+    try:
+        stamp = os.stat(path).st_mtime_ns
+    except OSError:
+        return {"files": [], "groups": {}}
+
+    entry = _index_cache.get(path)
+    if entry and entry["stamp"] == stamp and entry["scanned"] - stamp > MTIME_SLACK_NS:
+        return entry["index"]
+
+    scanned = time.time_ns()
+    index = _build_index(path)
+    debug_print(f"📇 Indexed {len(index['files'])} files in {directory}")
+    _index_cache.set(path, {"stamp": stamp, "scanned": scanned, "index": index})
+    return index
+
+
+def get_pieces(directory, asset_id):
+    """Return the absolute paths of <asset_id>_<n>.mp4 in directory, in natural order."""
+    names = get_index(directory)["groups"].get(str(asset_id), [])
+    return [os.path.abspath(os.path.join(directory, name)) for name in names]
+
+
+def has_file(directory, name):
+    """Check whether directory contains a file called name, according to the index."""
+    return name in get_index(directory)["files"]
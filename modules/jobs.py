@@ -0,0 +1,257 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+from modules.cache import flush_stores
+from modules.trace import finish_trace, span, start_trace
+
+# Import debug mode from main
+try:
+    from main import DEBUG_MODE
+except ImportError:
+    DEBUG_MODE = False
+
+def debug_print(message):
+    """Print message only in debug mode."""
+    if DEBUG_MODE:
+        print(message)
+
+# Job directory layout: tasks move pending/ -> claimed/ -> done/ by atomic renames
+PENDING_DIR = "pending"
+CLAIMED_DIR = "claimed"
+DONE_DIR = "done"
+POLL_INTERVAL = 0.5  # seconds
+HEARTBEAT_INTERVAL = 10  # seconds between claim file touches while a task runs
+STALE_CLAIM_SECONDS = 120  # claims without a heartbeat for this long are requeued
+
+
+def _write_json_atomic(path, data):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, path)
+
+
+class JobQueue:
+    """
+    A task queue backed by a shared job directory. Paths inside tasks are stored
+    relative to root, so workers on other hosts can resolve them against their own
+    mount of the project directory.
+    """
+
+    def __init__(self, jobs_dir, root=None):
+        self.jobs_dir = os.path.abspath(jobs_dir)
+        self.root = os.path.abspath(root or os.getcwd())
+        for name in (PENDING_DIR, CLAIMED_DIR, DONE_DIR):
+            os.makedirs(os.path.join(self.jobs_dir, name), exist_ok=True)
+
+    def to_shared(self, path):
+        """Convert a local path to a path relative to the project root."""
+        path = os.path.abspath(path)
+        if os.path.commonpath([path, self.root]) == self.root:
+            return os.path.relpath(path, self.root)
+        return path
+
+    def submit(self, kind, **params):
+        """Queue a task and return its ID."""
+        task_id = f"{int(time.time() * 1000)}_{uuid.uuid4().hex[:8]}"
+        task = {"id": task_id, "kind": kind, "params": params, "submitted": time.time()}
+        _write_json_atomic(os.path.join(self.jobs_dir, PENDING_DIR, f"{task_id}.json"), task)
+        debug_print(f"📤 Queued {kind} task {task_id}")
+        return task_id
+
+    def requeue_stale(self):
+        """Move claims whose worker stopped sending heartbeats back to pending/."""
+        claimed_dir = os.path.join(self.jobs_dir, CLAIMED_DIR)
+        now = time.time()
+        for name in os.listdir(claimed_dir):
+            path = os.path.join(claimed_dir, name)
+            try:
+                if now - os.path.getmtime(path) < STALE_CLAIM_SECONDS:
+                    continue
+                task_id = name.split("@", 1)[0]
+                os.rename(path, os.path.join(self.jobs_dir, PENDING_DIR, f"{task_id}.json"))
+                debug_print(f"⚠️ Requeued stale task {task_id}")
+            except OSError:
+                continue  # Finished or requeued by someone else in the meantime
+
+    def wait(self, task_id, timeout=None):
+        """Block until a task is done and return its result dict ({"ok": ..., ...})."""
+        done_path = os.path.join(self.jobs_dir, DONE_DIR, f"{task_id}.json")
+        started = time.time()
+        while not os.path.exists(done_path):
+            if timeout is not None and time.time() - started > timeout:
+                return {"ok": False, "error": f"Timed out waiting for task {task_id}"}
+            self.requeue_stale()
+            time.sleep(POLL_INTERVAL)
+        with open(done_path, "r") as f:
+            result = json.load(f)
+        os.remove(done_path)
+        return result
+
+    def run(self, kind, **params):
+        """Submit a task, wait for it and return its result dict."""
+        result = self.wait(self.submit(kind, **params))
+        if not result.get("ok"):
+            debug_print(f"❌ {kind} task failed: {result.get('error')}")
+        return result
+
+    def claim(self, worker_id):
+        """Atomically claim the oldest pending task. Returns (task, claim_path) or (None, None)."""
+        pending_dir = os.path.join(self.jobs_dir, PENDING_DIR)
+        for name in sorted(os.listdir(pending_dir)):
+            if not name.endswith(".json"):
+                continue
+            claim_path = os.path.join(self.jobs_dir, CLAIMED_DIR, f"{name[:-5]}@{worker_id}")
+            try:
+                os.rename(os.path.join(pending_dir, name), claim_path)
+            except OSError:
+                continue  # Another worker got it first
+            os.utime(claim_path)
+            with open(claim_path, "r") as f:
+                return json.load(f), claim_path
+        return None, None
+
+    def complete(self, task, claim_path, result):
+        """Publish a task result and release the claim."""
+        _write_json_atomic(os.path.join(self.jobs_dir, DONE_DIR, f"{task['id']}.json"), result)
+        try:
+            os.remove(claim_path)
+        except OSError:
+            pass
+
+
+def _resolve(root, path):
+    return path if os.path.isabs(path) else os.path.join(root, path)
+
+
+def _apply_settings(settings):
+    """Apply the coordinator's encoding settings in this worker."""
+    from modules import merge
+    from modules.profiles import set_profile
+
+    set_profile(settings.get("profile", "default"))
+    merge.SCREEN_CONTENT = settings.get("screen", False)
+
+
+def run_task(task, root, threads=None):
+    """Run one task and return its result dict."""
+    params = task["params"]
+    _apply_settings(params.get("settings", {}))
+    threads = threads or params.get("threads")
+    kind = task["kind"]
+
+    if kind == "normalize":
+        from modules.merge import normalize_video
+
+        ok = normalize_video(_resolve(root, params["input"]), _resolve(root, params["output"]), threads=threads)
+        return {"ok": ok}
+    if kind == "encode_chunk":
+        from modules.merge import encode_chunk
+
+        parts = [(_resolve(root, segment), start, duration) for segment, start, duration in params["parts"]]
+        ok = encode_chunk(parts, _resolve(root, params["output"]), threads)
+        return {"ok": ok}
+    if kind == "mix_audio":
+        from modules.bg import process_media
+
+        ok, message = process_media(_resolve(root, params["input"]), _resolve(root, params["bg"]), interactive=False)
+        return {"ok": ok, "output": message} if ok else {"ok": False, "error": message}
+    return {"ok": False, "error": f"Unknown task kind '{kind}'"}
+
+
+def run_worker(jobs_dir, root=None, threads=None, idle_exit=None):
+    """
+    Claim and run tasks from jobs_dir until interrupted, or until no task arrived
+    for idle_exit seconds.
+    """
+    queue = JobQueue(jobs_dir, root)
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    os.chdir(queue.root)  # Pipeline paths like ./cache are relative to the project root
+    print(f"👷 Worker {worker_id} watching {queue.jobs_dir}")
+    idle_since = time.time()
+    while True:
+        task, claim_path = queue.claim(worker_id)
+        if task is None:
+            if idle_exit is not None and time.time() - idle_since > idle_exit:
+                return
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        debug_print(f"⚙️ {worker_id} running {task['kind']} task {task['id']}")
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(HEARTBEAT_INTERVAL):
+                try:
+                    os.utime(claim_path)
+                except OSError:
+                    return
+
+        beat = threading.Thread(target=heartbeat, daemon=True)
+        beat.start()
+        try:
+            with span(f"task {task['kind']}", "task", id=task["id"], worker=worker_id):
+                result = run_task(task, queue.root, threads)
+        except Exception as e:
+            result = {"ok": False, "error": str(e)}
+        finally:
+            stop.set()
+        result["worker"] = worker_id
+        queue.complete(task, claim_path, result)
+        flush_stores()  # Workers are stopped with SIGTERM, which skips the flush at exit
+        idle_since = time.time()
+
+
+def start_local_workers(jobs_dir, count, root=None, threads=None):
+    """
+    Start count worker processes on this machine. Returns the Popen objects.
+    Each worker gets `threads` FFmpeg threads per task (default: its share of the CPU count),
+    so the workers together stay within the machine's cores.
+    """
+    threads = threads or max(1, (os.cpu_count() or 1) // count)
+    command = [sys.executable, "-m", "modules.jobs", "--jobs-dir", jobs_dir, "--threads", str(threads)]
+    if root:
+        command.extend(["--root", root])
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return [
+        subprocess.Popen(command, cwd=cwd, stdin=subprocess.DEVNULL)
+        for _ in range(count)
+    ]
+
+
+def stop_local_workers(processes):
+    """Stop worker processes started by start_local_workers."""
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run an encode worker on a shared job directory")
+    parser.add_argument("--jobs-dir", type=str, required=True, help="Shared job directory")
+    parser.add_argument(
+        "--root", type=str, help="This host's path to the project directory (default: current directory)"
+    )
+    parser.add_argument("--threads", type=int, help="FFmpeg threads per task (default: as requested by the coordinator)")
+    parser.add_argument("--idle-exit", type=float, help="Exit after this many seconds without tasks")
+    parser.add_argument("--trace", type=str, help="Append timing spans of this worker to a JSON-lines file")
+    args = parser.parse_args()
+    if args.trace:
+        start_trace(args.trace)
+    try:
+        run_worker(args.jobs_dir, args.root, args.threads, args.idle_exit)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        finish_trace()
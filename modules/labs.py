@@ -12,6 +12,10 @@ import whisper
 
 import sys
 
+from modules.probe import get_duration
+from modules.progress import run_ffmpeg
+from modules.trace import span
+
 # Import debug mode from main
 try:
     from main import DEBUG_MODE
@@ -121,6 +125,52 @@ def file_picker(files):
             return []
 
 
+def build_voiceover_audio(tts_audio_clips, output_path, duration=None):
+    """
+    Mix TTS clips (a list of (start seconds, clip path)) into one audio track,
+    each clip delayed to its start time. Raises CalledProcessError if FFmpeg fails.
+    """
+    ffmpeg_cmd = ["ffmpeg"]
+    for _, clip_path in tts_audio_clips:
+        ffmpeg_cmd.extend(["-i", clip_path])
+
+    filter_complex_parts = []
+    for i, (seg_start, _) in enumerate(tts_audio_clips):
+        delay_ms = int(seg_start * 1000)
+        filter_complex_parts.append(f"[{i}:a]adelay={delay_ms}:all=1[a{i}]")
+
+    delayed_streams = "".join(f"[a{i}]" for i in range(len(tts_audio_clips)))
+    filter_complex_parts.append(
+        f"{delayed_streams}amix=inputs={len(tts_audio_clips)}:normalize=0[aout]"
+    )
+    filter_complex = ";".join(filter_complex_parts)
+
+    ffmpeg_cmd.extend(
+        ["-filter_complex", filter_complex, "-map", "[aout]", "-y", output_path]
+    )
+    run_ffmpeg(ffmpeg_cmd, label=f"voiceover {os.path.basename(output_path)}", duration=duration).check_returncode()
+
+
+def merge_voiceover(video_path, audio_path, output_path):
+    """Replace the audio of a video with a voiceover track, copying the video stream."""
+    ffmpeg_merge_cmd = [
+        "ffmpeg",
+        "-i",
+        video_path,
+        "-i",
+        audio_path,
+        "-c:v",
+        "copy",
+        "-map",
+        "0:v",
+        "-map",
+        "1:a",
+        output_path,
+        "-y",
+    ]
+    run_ffmpeg(ffmpeg_merge_cmd, label=f"labs video {os.path.basename(video_path)}").check_returncode()
+
+
 # --------------------------
 # Main processing function
 # --------------------------
@@ -166,8 +216,10 @@ def process_labs(args):
         print(f"\nProcessing {idx} of {len(video_paths)}: {os.path.basename(video_path)}")
         
         # Transcribe audio directly from video
-        model = whisper.load_model("small")
-        result = model.transcribe(video_path, language="en", word_timestamps=False)
+        with span("whisper load model", "whisper"):
+            model = whisper.load_model("small")
+        with span(f"whisper transcribe {os.path.basename(video_path)}", "whisper"):
+            result = model.transcribe(video_path, language="en", word_timestamps=False)
         segments = result["segments"]
 
         transcript_segments = [
@@ -206,21 +258,23 @@ def process_labs(args):
             api_url = "https://api.elevenlabs.io/v1/text-to-speech/TX3LPaxmHKxFdv7VOQHJ"
             tts_audio_clips = []
             for seg in final_tts_segments:
-                response = requests.post(
-                    api_url,
-                    headers={"Content-Type": "application/json", "xi-api-key": api_key},
-                    data=json.dumps(
-                        {
-                            "voice_settings": {
-                                "stability": 0.4,
-                                "similarity_boost": 1,
-                                "use_speaker_boost": False,
-                            },
-                            "text": seg["text"],
-                            "model_id": "eleven_multilingual_v2",
-                        }
-                    ),
-                )
+                with span("tts request", "http", chars=len(seg["text"])) as record:
+                    response = requests.post(
+                        api_url,
+                        headers={"Content-Type": "application/json", "xi-api-key": api_key},
+                        data=json.dumps(
+                            {
+                                "voice_settings": {
+                                    "stability": 0.4,
+                                    "similarity_boost": 1,
+                                    "use_speaker_boost": False,
+                                },
+                                "text": seg["text"],
+                                "model_id": "eleven_multilingual_v2",
+                            }
+                        ),
+                    )
+                    record["status"] = response.status_code
                 if response.status_code != 200:
                     print(
                         f"Error in TTS API call for text: {seg['text']}\nResponse: {response.text}"
@@ -236,53 +290,12 @@ def process_labs(args):
                 print("No TTS clips were generated.")
                 sys.exit(1)
 
-            ffmpeg_cmd = ["ffmpeg"]
-            for _, clip_path in tts_audio_clips:
-                ffmpeg_cmd.extend(["-i", clip_path])
-
-            filter_complex_parts = []
-            for i, (seg_start, _) in enumerate(tts_audio_clips):
-                delay_ms = int(seg_start * 1000)
-                filter_complex_parts.append(f"[{i}:a]adelay={delay_ms}:all=1[a{i}]")
-
-            delayed_streams = "".join(f"[a{i}]" for i in range(len(tts_audio_clips)))
-            filter_complex_parts.append(
-                f"{delayed_streams}amix=inputs={len(tts_audio_clips)}:normalize=0[aout]"
-            )
-            filter_complex = ";".join(filter_complex_parts)
-
             final_audio_path = os.path.join(temp_dir, f"final_audio_{idx}.mp3")
-            ffmpeg_cmd.extend(
-                ["-filter_complex", filter_complex, "-map", "[aout]", "-y", final_audio_path]
-            )
-            # Suppress FFmpeg output unless in debug mode
-            if DEBUG_MODE:
-                subprocess.run(ffmpeg_cmd, check=True)
-            else:
-                subprocess.run(ffmpeg_cmd, check=True, capture_output=True)
+            build_voiceover_audio(tts_audio_clips, final_audio_path, duration=get_duration(video_path))
 
             # Merge with original video
             final_video_path = os.path.join(temp_dir, f"labs_{idx}_" + os.path.basename(video_path))
-            ffmpeg_merge_cmd = [
-                "ffmpeg",
-                "-i",
-                video_path,
-                "-i",
-                final_audio_path,
-                "-c:v",
-                "copy",
-                "-map",
-                "0:v",
-                "-map",
-                "1:a",
-                final_video_path,
-                "-y",
-            ]
-            # Suppress FFmpeg output unless in debug mode
-            if DEBUG_MODE:
-                subprocess.run(ffmpeg_merge_cmd, check=True)
-            else:
-                subprocess.run(ffmpeg_merge_cmd, check=True, capture_output=True)
+            merge_voiceover(video_path, final_audio_path, final_video_path)
 
             # Play the video for review
             try:
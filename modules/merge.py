@@ -5,6 +5,27 @@ import shutil
 import subprocess
 import logging
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.atomic import commit_output, discard_temp, is_complete, marker_path, read_marker, temp_output_path
+from modules.bg import BG_FILE, music_marker, music_output_path, prune_backups, timed_bed
+from modules.cache import CACHE_DIR, cache_key, cache_lookup, cache_path, cache_temp_path, evict, file_hash
+from modules.index import get_pieces, has_file
+from modules.profiles import aac_args, add_profile_argument, get_profile, get_profile_name, set_profile, x264_args
+from modules.probe import (
+    ProbeError,
+    get_duration,
+    get_file_info,
+    get_stream_signature,
+    get_streams,
+    get_video_packets,
+    has_audio,
+    moved,
+)
+from modules.progress import run_ffmpeg
+from modules.scratch import configure as configure_scratch, current_scratch, job_scratch
+from modules.trace import span
 
 # Import debug mode from main
 try:
@@ -17,266 +38,1226 @@ def debug_print(message):
     if DEBUG_MODE:
         print(message)
 
+# Normalization target
+TARGET_WIDTH = 1920
+TARGET_HEIGHT = 1080
+TARGET_FPS = 60
+VIDEO_CODEC = "libx264"
+PIX_FMT = "yuv420p"
+AUDIO_CODEC = "aac"
+AUDIO_RATE = 44100
+AUDIO_CHANNELS = 2
+NORMALIZE_PARAMS = {
+    "version": 3,  # Bump when the normalization filter chain changes
+    "width": TARGET_WIDTH,
+    "height": TARGET_HEIGHT,
+    "fps": TARGET_FPS,
+    "vcodec": VIDEO_CODEC,
+    "pix_fmt": PIX_FMT,
+    "acodec": AUDIO_CODEC,
+    "audio_rate": AUDIO_RATE,
+    "channels": AUDIO_CHANNELS,
+}
+
 
-def get_file_info(input_file):
+def normalize_params():
     """
-    Get detailed info about a file using ffprobe (duration, video frame rate, audio sample rate).
+    Return the parameters that determine a normalized clip: NORMALIZE_PARAMS plus the
+    current encoding profile. Used for cache keys and pipeline manifests.
     """
-    command = [
-        "ffprobe",
-        "-i",
-        input_file,
-        "-show_entries",
-        "format=duration:stream=codec_type,r_frame_rate,sample_rate,channels",
-        "-v",
-        "quiet",
-        "-of",
-        "json",
-    ]
-    result = subprocess.run(command, capture_output=True, text=True)
-    try:
-        data = json.loads(result.stdout)
-        duration = float(data["format"].get("duration", 0.0))
-        video_fps = None
-        audio_rate = None
-        audio_channels = None
-        for stream in data.get("streams", []):
-            if stream["codec_type"] == "video":
-                num, denom = stream["r_frame_rate"].split("/")
-                video_fps = float(num) / float(denom)
-            elif stream["codec_type"] == "audio":
-                audio_rate = int(stream.get("sample_rate", 0))
-                audio_channels = int(stream.get("channels", 0))
-        return {
-            "duration": duration,
-            "fps": video_fps,
-            "audio_rate": audio_rate,
-            "channels": audio_channels,
-        }
-    except (json.JSONDecodeError, ValueError, KeyError) as e:
-        print(f"⚠️ Error parsing ffprobe output for {input_file}: {e}")
-        return {"duration": 0.0, "fps": None, "audio_rate": None, "channels": None}
+    return {**NORMALIZE_PARAMS, "encoding": get_profile(), "screen": SCREEN_CONTENT}
+
+
+# Normalized clip cache
+NORMALIZED_CACHE_DIR = os.path.join(CACHE_DIR, "normalized")
+NORMALIZED_CACHE_MAX_BYTES = 20 * 1024 ** 3  # 20 GB
+BUMPER_CACHE_DIR = os.path.join(CACHE_DIR, "bumpers")  # Intro/outro, never evicted
+
+# Parallel normalization settings
+CPU_COUNT = os.cpu_count() or 1
+DEFAULT_WORKERS = 1  # 1 = sequential, 0 = one worker per piece (capped at CPU count)
+DEFAULT_THREADS = None  # None = CPU count / workers
+ASSET_JOBS = 0  # Missing assets built in parallel for an article (0 = one job per asset, capped at CPU count)
+USE_CACHE = True
+FAST_CONCAT = True  # Join matching normalized clips by stream copy instead of re-encoding
+SINGLE_PASS = False  # Normalize and concatenate in one ffmpeg graph (no intermediates)
+INCREMENTAL = False  # Rebuild existing articles, re-encoding only changed segments
+CHUNKS = 1  # Re-encode long timelines as this many parallel chunks
+MIN_CHUNK_SECONDS = 10
+BUILD_RECORD_VERSION = 2  # Bump when the build record layout changes
+SEEK_MARGIN = 0.001  # Seek this far past a segment's keyframe (well under one frame) when copying it out
+MUSIC_IN_MERGE = False  # Mix background music in during the final concatenation (see concatenate_with_music)
+JOB_QUEUE = None  # modules.jobs.JobQueue; when set, encodes run on workers (see set_job_queue)
+
+# Screen-content mode: drop duplicate frames and emit variable frame rate
+SCREEN_CONTENT = False
+SCREEN_TUNE = "stillimage"  # x264 tuning for mostly static UI frames
+SCREEN_TIMESCALE = 15360  # Shared mp4 video timescale so VFR clips can be stream-copied together
+
+
+def configure(args):
+    """
+    Apply merge options from the command line
+    (--workers, --threads, --no-cache, --reencode-concat, --single-pass, --screen, --incremental, --chunks,
+    --music-in-merge) and scratch space options (see modules/scratch.py).
+    Options that are not set keep their module defaults.
+    """
+    configure_scratch(args)
+    global DEFAULT_WORKERS, DEFAULT_THREADS, USE_CACHE, FAST_CONCAT, SINGLE_PASS, SCREEN_CONTENT
+    global INCREMENTAL, CHUNKS, ASSET_JOBS, MUSIC_IN_MERGE
+    if getattr(args, "workers", None) is not None:
+        DEFAULT_WORKERS = args.workers
+    if getattr(args, "threads", None) is not None:
+        DEFAULT_THREADS = args.threads
+    if getattr(args, "no_cache", False):
+        USE_CACHE = False
+    if getattr(args, "reencode_concat", False):
+        FAST_CONCAT = False
+    if getattr(args, "single_pass", False):
+        SINGLE_PASS = True
+    if getattr(args, "screen", False):
+        SCREEN_CONTENT = True
+    if getattr(args, "incremental", False):
+        INCREMENTAL = True
+    if getattr(args, "chunks", None) is not None:
+        CHUNKS = args.chunks if args.chunks > 0 else CPU_COUNT
+    if getattr(args, "asset_jobs", None) is not None:
+        ASSET_JOBS = args.asset_jobs
+    if getattr(args, "music_in_merge", False):
+        MUSIC_IN_MERGE = True
+
+
+def set_job_queue(queue):
+    """Send normalize and chunk encodes to workers through a modules.jobs.JobQueue (None = run locally)."""
+    global JOB_QUEUE
+    JOB_QUEUE = queue
+
+
+def task_settings():
+    """Return the settings a worker needs to encode exactly like this process."""
+    return {"profile": get_profile_name(), "screen": SCREEN_CONTENT}
+
+
+def video_filter():
+    """
+    Build the per-clip video filter chain. In screen-content mode, duplicate frames are
+    dropped (keeping at least one frame per second) instead of being encoded at a constant 60fps.
+    """
+    chain = f"scale={TARGET_WIDTH}:{TARGET_HEIGHT},setsar=1,fps={TARGET_FPS}"
+    if SCREEN_CONTENT:
+        chain += f",mpdecimate=max={TARGET_FPS}"
+    return chain + ",setpts=PTS-STARTPTS"
+
+
+def video_encode_args(threads=None):
+    """
+    Build the video encoder and frame rate arguments: constant 60fps by default,
+    variable frame rate with static-content x264 tuning in screen-content mode.
+    """
+    if SCREEN_CONTENT:
+        return [
+            *x264_args(threads, tune=SCREEN_TUNE),
+            "-fps_mode",
+            "vfr",
+            "-video_track_timescale",
+            str(SCREEN_TIMESCALE),
+        ]
+    return [*x264_args(threads), "-r", str(TARGET_FPS)]
+
+
+_job_budget = threading.local()
+
+
+def cpu_budget():
+    """
+    Return the number of CPUs the job running in this thread may use:
+    a share of the CPU count while several assets are built in parallel, all of them otherwise.
+    """
+    return getattr(_job_budget, "cpus", CPU_COUNT)
+
+
+def resolve_workers(workers, job_count):
+    """
+    Resolve the number of parallel normalization workers for job_count jobs.
+    """
+    if JOB_QUEUE is not None:
+        return max(1, job_count)  # Queue every job at once; workers pick them up
+    if workers is None:
+        workers = DEFAULT_WORKERS
+    if workers <= 0:
+        workers = cpu_budget()
+    return max(1, min(workers, job_count))
+
+
+def resolve_threads(threads, workers):
+    """
+    Resolve the per-job ffmpeg -threads budget so that workers * threads stays within the CPU count.
+    """
+    if threads is None:
+        threads = DEFAULT_THREADS
+    if threads:
+        return threads
+    if workers <= 1 and cpu_budget() == CPU_COUNT:
+        return None  # Let ffmpeg decide when running a single job
+    return max(1, cpu_budget() // workers)
 
 
 def get_sorted_video_files(directory, asset_id=None, article_ids=None):
     """
     Get a list of video files for an asset or article sequence.
-    For assets: Collect all files matching the asset ID (e.g., 45_0.mp4, 45_1.mp4).
+    For assets: Collect all files matching the asset ID (e.g., 45_0.mp4, 45_1.mp4, ..., 45_10.mp4).
     For articles: Collect files for each asset ID (e.g., 23.mp4).
+    Directories are read through the shared index (modules/index.py), listed once per change.
     """
     if asset_id:
-        # For assets: Collect all files like <asset_id>_<index>.mp4
-        files = [f for f in os.listdir(directory) if f.startswith(f"{asset_id}_") and f.endswith(".mp4")]
+        # For assets: Collect all files like <asset_id>_<index>.mp4, in numeric order
+        files = get_pieces(directory, asset_id)
         if not files:
             debug_print(f"❌ No files found for asset ID {asset_id} in {directory}")
-            return []
-        files.sort()  # Sort by index (e.g., 45_0.mp4, 45_1.mp4)
-        return [os.path.abspath(os.path.join(directory, f)) for f in files]
+        return files
     
     if article_ids:
-        # For articles: Collect single files like <asset_id>.mp4
-        video_files = []
-        for asset_id in article_ids:
-            asset_file = os.path.abspath(os.path.join(directory, f"{asset_id}.mp4"))
-            if not os.path.exists(asset_file):
-                debug_print(f"⚠️ Asset video {asset_file} not found. Generating from ./pieces/")
-                # Generate the asset video using asset logic
-                asset_videos = get_sorted_video_files("./pieces", asset_id=asset_id)
-                if not asset_videos:
-                    debug_print(f"❌ Failed to generate asset video {asset_file}: No source files found")
-                    continue
-                # Normalize and concatenate to create the asset video
-                temp_output = asset_file  # Directly create ./assets/<asset_id>.mp4
-                normalized_files = normalize_and_collect(asset_videos, asset_id, "./pieces/trash")
-                if not normalized_files:
-                    debug_print(f"❌ Failed to normalize files for asset {asset_id}")
-                    continue
-                concatenate_videos(normalized_files, temp_output, asset_id)
-                if not os.path.exists(asset_file):
-                    debug_print(f"❌ Failed to generate asset video {asset_file}")
-                    continue
-                debug_print(f"✅ Successfully generated asset video {asset_file}")
-            video_files.append(asset_file)
-        return video_files
+        # For articles: Collect single files like <asset_id>.mp4, building missing ones first
+        asset_files = [os.path.abspath(os.path.join(directory, f"{asset_id}.mp4")) for asset_id in article_ids]
+        missing = [
+            (asset_id, asset_file)
+            for asset_id, asset_file in zip(article_ids, asset_files)
+            if not has_file(directory, f"{asset_id}.mp4") or not is_complete(asset_file)
+        ]
+        built = build_missing_assets(missing)
+        return [
+            asset_file
+            for asset_id, asset_file in zip(article_ids, asset_files)
+            if built.get(asset_id, True)
+        ]
     
     debug_print("❌ Invalid call to get_sorted_video_files: No asset_id or article_ids provided")
     return []
 
 
-def check_audio_stream(input_file):
+def build_asset(asset_id, asset_file, cpus=None, parent_scratch=None):
     """
-    Check if the input video has an audio stream.
+    Build an asset video from its pieces in ./pieces/, using at most cpus CPUs.
+    Returns True if successful, False otherwise.
     """
-    command = [
-        "ffprobe",
-        "-i",
-        input_file,
-        "-show_streams",
-        "-select_streams",
-        "a",
-        "-loglevel",
-        "error",
-    ]
-    result = subprocess.run(command, capture_output=True, text=True)
-    return bool(result.stdout.strip())
+    debug_print(f"⚠️ Asset video {asset_file} not found or incomplete. Generating from ./pieces/")
+    asset_videos = get_pieces("./pieces", asset_id)
+    if not asset_videos:
+        debug_print(f"❌ Failed to generate asset video {asset_file}: No source files found")
+        return False
+
+    if cpus:
+        _job_budget.cpus = cpus
+    try:
+        with span(f"build asset {asset_id}", pieces=len(asset_videos), cpus=cpus or CPU_COUNT):
+            # Normalize and concatenate to create the asset video
+            if SINGLE_PASS:
+                success = merge_single_pass(asset_videos, asset_file, asset_id)
+            else:
+                with job_scratch(f"asset_{asset_id}", parent=parent_scratch) as trash_dir:
+                    normalized_files = normalize_and_collect(asset_videos, asset_id, trash_dir)
+                    if not normalized_files:
+                        debug_print(f"❌ Failed to normalize files for asset {asset_id}")
+                        return False
+                    success = concatenate_videos(normalized_files, asset_file, asset_id)
+    finally:
+        if cpus:
+            del _job_budget.cpus
+    if not success:
+        debug_print(f"❌ Failed to generate asset video {asset_file}")
+        return False
+    debug_print(f"✅ Successfully generated asset video {asset_file}")
+    return True
+
+
+def build_missing_assets(missing):
+    """
+    Build missing assets (a list of (asset_id, asset_file)) as parallel jobs that share the CPU count.
+    Returns {asset_id: success}.
+    """
+    if not missing:
+        return {}
+    jobs = ASSET_JOBS if ASSET_JOBS > 0 else CPU_COUNT
+    jobs = max(1, min(jobs, len(missing)))
+    if jobs == 1:
+        return {asset_id: build_asset(asset_id, asset_file) for asset_id, asset_file in missing}
+
+    cpus = max(1, CPU_COUNT // jobs)
+    debug_print(f"⚙️ Building {len(missing)} missing assets with {jobs} parallel jobs ({cpus} CPUs each)")
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            asset_id: executor.submit(build_asset, asset_id, asset_file, cpus, current_scratch())
+            for asset_id, asset_file in missing
+        }
+        return {asset_id: future.result() for asset_id, future in futures.items()}
 
 
-def normalize_video(input_file, output_file):
+def check_conformance(input_file):
+    """
+    Check which streams of a file already match the normalization target.
+    Returns (video_ok, audio_ok); audio_ok is False when the file has no audio.
+    """
+    videos = get_streams(input_file, "video")
+    audios = get_streams(input_file, "audio")
+    target_rate = f"{TARGET_FPS}/1"
+    # In screen-content mode video is always re-encoded so duplicate frames get dropped
+    video_ok = bool(videos) and not SCREEN_CONTENT and all(
+        [
+            videos[0].get("codec_name") == "h264",
+            videos[0].get("width") == TARGET_WIDTH,
+            videos[0].get("height") == TARGET_HEIGHT,
+            videos[0].get("pix_fmt") == PIX_FMT,
+            videos[0].get("r_frame_rate") == target_rate,
+            videos[0].get("avg_frame_rate") == target_rate,
+        ]
+    )
+    audio_ok = bool(audios) and all(
+        [
+            audios[0].get("codec_name") == AUDIO_CODEC,
+            str(audios[0].get("sample_rate")) == str(AUDIO_RATE),
+            audios[0].get("channels") == AUDIO_CHANNELS,
+        ]
+    )
+    return video_ok, audio_ok
+
+
+def normalize_video(input_file, output_file, threads=None):
     """
     Normalize video to 1920x1080, 60fps, H.264, with stereo AAC audio at 44.1kHz.
+    Streams that already match the target are stream-copied instead of re-encoded.
+    If threads is set, ffmpeg is limited to that many threads.
+    Returns True if successful, False otherwise.
     """
-    has_audio = check_audio_stream(input_file)
+    try:
+        input_has_audio = has_audio(input_file)
+        video_ok, audio_ok = check_conformance(input_file)
+    except ProbeError as e:
+        debug_print(f"❌ {e}")
+        return False
     info = get_file_info(input_file)
     debug_print(
         f"📋 Input {os.path.basename(input_file)}: Duration={info['duration']:.2f}s, FPS={info['fps']}, Audio Rate={info['audio_rate']}, Channels={info['channels']}"
     )
 
-    command = [
-        "ffmpeg",
-        "-y",
-        "-i",
-        input_file,
-        "-vf",
-        "scale=1920:1080,fps=60,setpts=PTS-STARTPTS",
-        "-c:v",
-        "libx264",
-        "-r",
-        "60",
-        "-pix_fmt",
-        "yuv420p",
-    ]
+    command = ["ffmpeg", "-y", "-i", input_file]
+    if not input_has_audio:
+        # Add a silent track so every clip has audio for concatenation
+        command.extend(["-f", "lavfi", "-i", f"anullsrc=channel_layout=stereo:sample_rate={AUDIO_RATE}"])
+    command.extend(["-map", "0:v:0", "-map", "0:a:0" if input_has_audio else "1:a:0"])
 
-    if has_audio:
+    if video_ok:
+        command.extend(["-c:v", "copy"])
+    else:
         command.extend(
             [
-                "-af",
-                "aresample=44100,asetpts=PTS-STARTPTS",
-                "-c:a",
-                "aac",
-                "-ac",
-                "2",
-                "-ar",
-                "44100",
+                "-vf",
+                video_filter(),
+                *video_encode_args(threads),
+                "-pix_fmt",
+                PIX_FMT,
             ]
         )
+
+    if audio_ok:
+        command.extend(["-c:a", "copy"])
     else:
         command.extend(
             [
-                "-f",
-                "lavfi",
-                "-i",
-                "anullsrc=channel_layout=stereo:sample_rate=44100",
-                "-c:a",
-                "aac",
+                "-af",
+                f"aresample={AUDIO_RATE},asetpts=PTS-STARTPTS",
+                *aac_args(),
                 "-ac",
-                "2",
+                str(AUDIO_CHANNELS),
                 "-ar",
-                "44100",
-                "-af",
-                "asetpts=PTS-STARTPTS",
+                str(AUDIO_RATE),
             ]
         )
+    if not input_has_audio:
+        command.append("-shortest")
 
     command.append(output_file)
-    result = subprocess.run(command, capture_output=True, text=True)
+    result = run_ffmpeg(command, label=f"normalize {os.path.basename(input_file)}")
     if result.returncode != 0:
         debug_print(f"❌ FFmpeg Error while normalizing {input_file}:\n{result.stderr}")
-    else:
-        norm_info = get_file_info(output_file)
-        debug_print(
-            f"✅ Normalized: {input_file} -> {output_file} (Duration={norm_info['duration']:.2f}s, Channels={norm_info['channels']})"
-        )
+        return False
+    norm_info = get_file_info(output_file)
+    mode = "copied" if video_ok and audio_ok else "video copied" if video_ok else "re-encoded"
+    debug_print(
+        f"✅ Normalized ({mode}): {input_file} -> {output_file} (Duration={norm_info['duration']:.2f}s, Channels={norm_info['channels']})"
+    )
+    return True
+
+
+def run_normalize(input_file, output_file, threads=None):
+    """Run normalize_video locally, or on a worker when a job queue is set."""
+    if JOB_QUEUE is None:
+        return normalize_video(input_file, output_file, threads=threads)
+    result = JOB_QUEUE.run(
+        "normalize",
+        input=JOB_QUEUE.to_shared(input_file),
+        output=JOB_QUEUE.to_shared(output_file),
+        threads=threads,
+        settings=task_settings(),
+    )
+    return bool(result.get("ok"))
 
 
-def normalize_and_collect(video_files, base_id, trash_dir):
+def normalize_cached(input_file, threads=None):
+    """
+    Normalize a video through the persistent cache, keyed by the source hash and normalize_params().
+    Returns the path of the cached normalized clip, or None on failure.
+    """
+    key = cache_key(input_file, normalize_params())
+    cached = cache_lookup(NORMALIZED_CACHE_DIR, key)
+    if cached:
+        debug_print(f"♻️ Reusing cached normalized clip for {os.path.basename(input_file)}")
+        return cached
+
+    temp_file = cache_temp_path(NORMALIZED_CACHE_DIR, key)
+    try:
+        if not run_normalize(input_file, temp_file, threads=threads):
+            return None
+        final_file = cache_path(NORMALIZED_CACHE_DIR, key)
+        os.replace(temp_file, final_file)
+        moved(temp_file, final_file)
+        return final_file
+    finally:
+        discard_temp(temp_file)
+
+
+def manifest_path(video_file):
+    """Return the path of the sidecar manifest for a pipeline output."""
+    return f"{video_file}.manifest.json"
+
+
+def write_manifest(video_file):
+    """
+    Record that video_file was produced by the normalize+concat pipeline,
+    with the normalization settings and a hash of the file.
+    """
+    manifest = {
+        "normalized": True,
+        "params": normalize_params(),
+        "sha256": file_hash(video_file),
+    }
+    with open(manifest_path(video_file), "w") as f:
+        json.dump(manifest, f, indent=4)
+
+
+def is_pipeline_normalized(video_file):
+    """
+    Check if video_file has a manifest matching the current normalization settings and its content hash.
+    """
+    try:
+        with open(manifest_path(video_file), "r") as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return False
+    return (
+        manifest.get("normalized") is True
+        and manifest.get("params") == normalize_params()
+        and manifest.get("sha256") == file_hash(video_file)
+    )
+
+
+def prepare_bumper(source_file):
+    """
+    Return a pre-normalized copy of an intro/outro clip from the bumper cache.
+    The clip is normalized again only when the source file (or normalize_params()) changes.
+    Falls back to the source file if normalization fails.
+    """
+    name = os.path.splitext(os.path.basename(source_file))[0]
+    key = f"{name}_{cache_key(source_file, normalize_params())}"
+    cached = cache_lookup(BUMPER_CACHE_DIR, key)
+    if cached and is_pipeline_normalized(cached):
+        debug_print(f"♻️ Using cached {name} clip")
+        return cached
+
+    temp_file = cache_temp_path(BUMPER_CACHE_DIR, key)
+    try:
+        if not normalize_video(source_file, temp_file):
+            debug_print(f"⚠️ Failed to pre-normalize {source_file}. Using the source file.")
+            return source_file
+        final_file = cache_path(BUMPER_CACHE_DIR, key)
+        os.replace(temp_file, final_file)
+        moved(temp_file, final_file)
+        write_manifest(final_file)
+    finally:
+        discard_temp(temp_file)
+
+    # Drop versions built from older sources
+    for entry in os.listdir(BUMPER_CACHE_DIR):
+        if entry.startswith(f"{name}_") and not entry.startswith(key) and ".partial" not in entry:
+            os.remove(os.path.join(BUMPER_CACHE_DIR, entry))
+    debug_print(f"✅ Cached pre-normalized {name} clip")
+    return final_file
+
+
+def normalize_and_collect(video_files, base_id, trash_dir, workers=None, threads=None, use_cache=None):
     """
     Helper function to normalize a list of video files and collect them in the trash directory.
+    With use_cache, normalized clips are taken from (and stored in) the persistent cache
+    instead, so unchanged pieces are never re-encoded.
+    Files with a valid pipeline manifest (see write_manifest) are used as they are.
+    With workers > 1 (or 0 for auto), pieces are normalized in parallel, each ffmpeg job
+    limited to `threads` threads. The returned list keeps the order of video_files.
     """
     os.makedirs(trash_dir, exist_ok=True)
+    if use_cache is None:
+        use_cache = USE_CACHE
+
+    def normalize_one(i, video, threads):
+        if is_pipeline_normalized(video):
+            debug_print(f"♻️ {os.path.basename(video)} is already normalized. Using it as is.")
+            return os.path.abspath(video)
+        if use_cache:
+            return normalize_cached(video, threads=threads)
+        norm_file = os.path.abspath(os.path.join(trash_dir, f"normalized_{base_id}_{i}.mp4"))
+        if is_complete(norm_file):
+            return norm_file
+        temp_file = temp_output_path(norm_file)
+        try:
+            if run_normalize(video, temp_file, threads=threads) and commit_output(temp_file, norm_file):
+                return norm_file
+            return None
+        finally:
+            discard_temp(temp_file)
+
+    workers = resolve_workers(workers, len(video_files))
+    threads = resolve_threads(threads, workers)
+    with span(f"normalize {base_id}", files=len(video_files), workers=workers, threads=threads):
+        if workers == 1:
+            results = [normalize_one(i, video, threads) for i, video in enumerate(video_files)]
+        else:
+            debug_print(f"⚙️ Normalizing {len(video_files)} files with {workers} workers ({threads} threads each)")
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(normalize_one, i, video, threads)
+                    for i, video in enumerate(video_files)
+                ]
+                results = [future.result() for future in futures]
+
     normalized_files = []
-    for i, video in enumerate(video_files):
-        norm_file = os.path.abspath(
-            os.path.join(trash_dir, f"normalized_{base_id}_{i}.mp4")
-        )
-        if not os.path.exists(norm_file):
-            normalize_video(video, norm_file)
-        if os.path.exists(norm_file):
+    for video, norm_file in zip(video_files, results):
+        if norm_file:
             normalized_files.append(norm_file)
         else:
             debug_print(f"❌ Failed to normalize {video}. Skipping.")
+
+    if use_cache:
+        evict(NORMALIZED_CACHE_DIR, NORMALIZED_CACHE_MAX_BYTES, keep=normalized_files)
     return normalized_files
 
 
-def concatenate_videos(normalized_files, output_file, base_id):
+def can_stream_copy(normalized_files):
     """
-    Helper function to concatenate normalized files into a single output.
+    Check that all files have one video and one audio stream with identical parameters.
     """
-    if os.path.exists(output_file):
-        os.remove(output_file)
+    # VFR clips from screen-content mode differ in frame rate but still join cleanly
+    signatures = [
+        get_stream_signature(f, include_frame_rate=not SCREEN_CONTENT) for f in normalized_files
+    ]
+    first = signatures[0]
+    if not first or [kind for kind, *_ in first] != ["video", "audio"]:
+        return False
+    return all(signature == first for signature in signatures[1:])
 
-    if len(normalized_files) < 1:
-        debug_print(f"❌ No valid files to concatenate for {base_id}")
+
+def timeline_duration(video_files):
+    """Return the total duration of files played back to back, or None if one cannot be probed."""
+    try:
+        return sum(get_duration(video) for video in video_files)
+    except ProbeError:
+        return None
+
+
+def concat_pads(n):
+    """Build the concat filter input pad list for n inputs, e.g. [0:v][0:a][1:v][1:a]..."""
+    return "".join(f"[{i}:v][{i}:a]" for i in range(n))
+
+
+def segment_layout(segment_files):
+    """
+    Return the (start, duration) of each segment in the concatenated output, in seconds.
+    """
+    layout = []
+    start = 0.0
+    for segment in segment_files:
+        duration = get_duration(segment)
+        layout.append((start, duration))
+        start += duration
+    return layout
+
+
+def keyframe_args(segment_files):
+    """
+    Build -force_key_frames arguments so every segment starts on a keyframe in an
+    encoded output. Stream-copied outputs already start each clip on a keyframe.
+    """
+    starts = [f"{start:.3f}" for start, _ in segment_layout(segment_files)[1:]]
+    return ["-force_key_frames", ",".join(starts)] if starts else []
+
+
+def audio_encode_args(stream=None):
+    """
+    Build the AAC, channel and sample rate arguments for all audio streams of an output,
+    or only for its audio stream number `stream` (e.g. -c:a:1 aac -ac:a:1 2).
+    """
+    args = [*aac_args(), "-ac", str(AUDIO_CHANNELS), "-ar", str(AUDIO_RATE)]
+    if stream is None:
+        return args
+    options = [option if option.endswith(":a") else f"{option}:a" for option in args[0::2]]
+    return [arg for option, value in zip(options, args[1::2]) for arg in (f"{option}:{stream}", value)]
+
+
+def tee_target(output_files, faststart=False):
+    """Build a tee muxer target that writes video stream 0 and audio stream i to output_files[i] (mp4)."""
+    options = "f=mp4:movflags=+faststart" if faststart else "f=mp4"
+    targets = []
+    for i, output_file in enumerate(output_files):
+        escaped = output_file.replace("\\", "\\\\").replace("'", "\\'").replace("|", "\\|")
+        targets.append(f"[{options}:select=\\'v:0,a:{i}\\']{escaped}")
+    return "|".join(targets)
+
+
+def finish_concat(command, filters, video, audio, video_args, output_file, music=None, copy_audio=False, faststart=False):
+    """
+    Complete a concatenation command: add the filter graph, map video and audio (input streams
+    such as "0:v:0" or filter outputs such as "[v]"), video_args, the audio options (stream copy
+    or AAC at the target rate) and the output.
+    With music ({"bed", "output"}), the pre-rendered background bed (see bg.timed_bed) is mixed into a
+    second audio stream in the same graph and the tee muxer writes output_file and music["output"]
+    in one pass, so the video is encoded (or copied) only once for both.
+    """
+    if music is None:
+        graph = ["-filter_complex", ";".join(filters)] if filters else []
+        audio_args = ["-c:a", "copy"] if copy_audio else audio_encode_args()
+        movflags = ["-movflags", "+faststart"] if faststart else []
+        return [*command, *graph, "-map", video, "-map", audio, *video_args, *audio_args, *movflags, output_file]
+
+    filters = list(filters)
+    bed_input = command.count("-i")
+    if audio.startswith("["):
+        # A filter output can only be used once: split it for the plain and the music output
+        filters.append(f"{audio}asplit=2[plain][mix]")
+        audio, mix = "[plain]", "[mix]"
+    else:
+        mix = f"[{audio}]"
+    filters.append(
+        f"{mix}[{bed_input}:a]amix=inputs=2:duration=longest,"
+        f"aformat=sample_rates={AUDIO_RATE}:channel_layouts=stereo[music]"
+    )
+    plain_audio = ["-c:a:0", "copy"] if copy_audio else audio_encode_args(0)
+    return [
+        *command,
+        "-i",
+        music["bed"],
+        "-filter_complex",
+        ";".join(filters),
+        "-map",
+        video,
+        "-map",
+        audio,
+        "-map",
+        "[music]",
+        *video_args,
+        *plain_audio,
+        *audio_encode_args(1),
+        "-flags",
+        "+global_header",  # The tee muxer needs codec headers up front for mp4
+        "-f",
+        "tee",
+        tee_target([output_file, music["output"]], faststart),
+    ]
+
+
+def build_record_path(output_file):
+    """Return the path of the incremental build record for an output."""
+    return f"{output_file}.build.json"
+
+
+def keyframe_layout(output_file, segment_files):
+    """
+    Return the (start, duration, frames) of each segment in output_file, starting at the real
+    keyframe that begins it. The sum of container durations only approximates where a segment
+    begins; cutting there can start a copy at the previous segment's last keyframe.
+    Returns None if the packets of output_file cannot be read.
+    """
+    try:
+        packets = get_video_packets(output_file)
+        total = get_duration(output_file)
+    except ProbeError as e:
+        debug_print(f"⚠️ Could not read keyframes of {output_file}: {e}")
+        return None
+    keyframes = [time for time, is_keyframe in packets if is_keyframe]
+    if not keyframes:
+        return None
+    # Every segment starts on a keyframe; take the one closest to its nominal start
+    starts = [min(keyframes, key=lambda keyframe: abs(keyframe - start)) for start, _ in segment_layout(segment_files)]
+    ends = [*starts[1:], None]
+    layout = []
+    for start, end in zip(starts, ends):
+        frames = sum(1 for time, _ in packets if time >= start and (end is None or time < end))
+        layout.append((start, (total if end is None else end) - start, frames))
+    return layout
+
+
+def write_build_record(output_file, video_files, segment_files):
+    """
+    Record the source hash, keyframe position and frame count of every segment in output_file,
+    so a later incremental build can stream-copy unchanged segments out of it.
+    """
+    layout = keyframe_layout(output_file, segment_files)
+    if layout is None:
+        # A stale record would point at segments of the previous build
+        if os.path.exists(build_record_path(output_file)):
+            os.remove(build_record_path(output_file))
         return
-    elif len(normalized_files) == 1:
-        command = [
-            "ffmpeg",
-            "-y",
-            "-i",
-            normalized_files[0],
-            "-c",
-            "copy",
+    # An output mixed with background music during the merge keeps its plain version in backup/
+    mixed = (read_marker(output_file) or {}).get("music")
+    record = {
+        "version": BUILD_RECORD_VERSION,
+        "params": normalize_params(),
+        "output_sha256": mixed["source_sha256"] if mixed else file_hash(output_file),
+        "segments": [
+            {"source": video, "sha256": file_hash(video), "start": start, "duration": duration, "frames": frames}
+            for video, (start, duration, frames) in zip(video_files, layout)
+        ],
+    }
+    with open(build_record_path(output_file), "w") as f:
+        json.dump(record, f, indent=4)
+
+
+def is_previous_build(output_file, record):
+    """
+    Check that output_file is the build described by record, or that build with background
+    music mixed in afterwards (its music marker names the plain build as the source).
+    """
+    if not os.path.exists(output_file):
+        return False
+    mixed = (read_marker(output_file) or {}).get("music")
+    if mixed and mixed.get("source_sha256") == record["output_sha256"]:
+        return True
+    return file_hash(output_file) == record["output_sha256"]
+
+
+def extract_segment(reference_file, segment, output_file):
+    """
+    Stream-copy one segment (a build record entry) out of a previous build.
+    Input -ss with stream copy starts at the last keyframe at or before the seek time, so the seek
+    lands just after the segment's keyframe, never before it; the video stops after the segment's
+    frames so the next segment's keyframe is not copied too.
+    Returns True if successful, False otherwise.
+    """
+    start, duration = segment["start"], segment["duration"]
+    command = [
+        "ffmpeg",
+        "-y",
+        "-ss",
+        f"{start + SEEK_MARGIN:.6f}",
+        "-i",
+        reference_file,
+        "-t",
+        f"{duration - SEEK_MARGIN:.6f}",
+        "-frames:v",
+        str(segment["frames"]),
+        "-map",
+        "0:v:0",
+        "-map",
+        "0:a:0",
+        "-c",
+        "copy",
+        "-avoid_negative_ts",
+        "make_zero",
+        output_file,
+    ]
+    result = run_ffmpeg(command, label=f"segment {os.path.basename(output_file)}")
+    if result.returncode != 0:
+        debug_print(f"❌ FFmpeg Error while extracting segment at {start:.3f}s from {reference_file}:\n{result.stderr}")
+        return False
+    return True
+
+
+def incremental_rebuild(video_files, output_file, base_id, trash_dir, reference_files=()):
+    """
+    Rebuild output_file re-encoding only segments whose source changed since the last build.
+    Unchanged segments are stream-copied out of the previous output (or one of
+    reference_files, e.g. a backup taken before background music was added).
+    Returns True if the output is up to date or was rebuilt, False if a full build is needed.
+    """
+    try:
+        with open(build_record_path(output_file), "r") as f:
+            record = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return False
+    if record.get("version") != BUILD_RECORD_VERSION:
+        debug_print(f"⚠️ Build record of {base_id} is from an older version. Rebuilding from scratch.")
+        return False
+    if record.get("params") != normalize_params():
+        debug_print(f"⚠️ Normalization settings changed for {base_id}. Rebuilding from scratch.")
+        return False
+
+    hashes = [file_hash(video) for video in video_files]
+    previous = record["segments"]
+    if hashes == [segment["sha256"] for segment in previous] and is_previous_build(output_file, record):
+        debug_print(f"✅ {output_file} is up to date. Nothing to rebuild for {base_id}.")
+        return True
+
+    # Find an unmodified copy of the previous build to copy unchanged segments from
+    reference = None
+    for candidate in (output_file, *reference_files):
+        if os.path.exists(candidate) and file_hash(candidate) == record["output_sha256"]:
+            reference = candidate
+            break
+    if reference is None:
+        debug_print(f"⚠️ Previous build of {base_id} was modified or removed. Rebuilding from scratch.")
+        return False
+
+    previous_by_hash = {segment["sha256"]: segment for segment in previous}
+    os.makedirs(trash_dir, exist_ok=True)
+    segment_files = []
+    changed = []
+    for i, (video, sha256) in enumerate(zip(video_files, hashes)):
+        segment = previous_by_hash.get(sha256)
+        segment_file = os.path.abspath(os.path.join(trash_dir, f"segment_{base_id}_{i}.mp4"))
+        if segment and extract_segment(reference, segment, segment_file):
+            segment_files.append(segment_file)
+            continue
+        changed.append(i)
+        segment_files.append(None)
+
+    debug_print(f"🔁 Re-encoding {len(changed)} of {len(video_files)} segments for {base_id}")
+    normalized = normalize_and_collect([video_files[i] for i in changed], base_id, trash_dir)
+    if len(normalized) != len(changed):
+        return False
+    for i, norm_file in zip(changed, normalized):
+        segment_files[i] = norm_file
+
+    if not can_stream_copy(segment_files):
+        return False
+    temp_file = temp_output_path(output_file)
+    try:
+        if not concatenate_copy(segment_files, temp_file, base_id) or not commit_output(temp_file, output_file):
+            return False
+    finally:
+        discard_temp(temp_file)
+    write_manifest(output_file)
+    write_build_record(output_file, video_files, segment_files)
+    debug_print(f"✅ Incrementally rebuilt {output_file}")
+    return True
+
+
+def concatenate_copy(normalized_files, output_file, base_id, music=None):
+    """
+    Join files with the concat demuxer and stream copy (no re-encoding).
+    With music, also write the version with background music (see finish_concat).
+    Returns True if successful, False otherwise.
+    """
+    list_file = f"{output_file}.concat.txt"
+    with open(list_file, "w") as f:
+        for norm_file in normalized_files:
+            escaped = os.path.abspath(norm_file).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    command = finish_concat(
+        ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_file],
+        [],
+        "0:v:0",
+        "0:a:0",
+        ["-c:v", "copy"],
+        output_file,
+        music,
+        copy_audio=True,
+        faststart=True,
+    )
+    try:
+        result = run_ffmpeg(command, label=f"concat {base_id}", duration=timeline_duration(normalized_files))
+    finally:
+        os.remove(list_file)
+    if result.returncode != 0:
+        debug_print(f"❌ FFmpeg Error while stream-copying {base_id}:\n{result.stderr}")
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        return False
+    return True
+
+
+def plan_chunks(segment_files, chunks):
+    """
+    Split the timeline of segment_files into up to `chunks` chunks of similar length.
+    Chunks end at segment boundaries where possible; segments longer than a chunk are cut.
+    Returns a list of chunks, each a list of (file, start, duration) parts.
+    """
+    layout = segment_layout(segment_files)
+    total = sum(duration for _, duration in layout)
+    target = max(total / chunks, MIN_CHUNK_SECONDS)
+    plan = [[]]
+    filled = 0.0
+    for segment, (_, duration) in zip(segment_files, layout):
+        offset = 0.0
+        while duration - offset > 0.001:
+            remaining = duration - offset
+            room = target - filled
+            last_chunk = len(plan) >= chunks
+            if not last_chunk and plan[-1] and (room < MIN_CHUNK_SECONDS or (remaining > room and filled >= target / 2)):
+                # Close the chunk at this boundary rather than cutting a short piece
+                plan.append([])
+                filled = 0.0
+                continue
+            take = remaining if last_chunk or remaining <= room + MIN_CHUNK_SECONDS else room
+            plan[-1].append((segment, offset, take))
+            offset += take
+            filled += take
+    return [chunk for chunk in plan if chunk]
+
+
+def encode_chunk(parts, output_file, threads):
+    """
+    Encode the video of one chunk (a list of (file, start, duration) parts) as a closed-GOP H.264 stream.
+    Returns True if successful, False otherwise.
+    """
+    command = ["ffmpeg", "-y"]
+    for segment, start, duration in parts:
+        command.extend(["-ss", f"{start:.3f}", "-t", f"{duration:.3f}", "-i", segment])
+    pads = "".join(f"[{i}:v]" for i in range(len(parts)))
+    starts = []
+    position = 0.0
+    for _, _, duration in parts[:-1]:
+        position += duration
+        starts.append(f"{position:.3f}")
+    command.extend(["-filter_complex", f"{pads}concat=n={len(parts)}:v=1:a=0[v]", "-map", "[v]"])
+    if starts:
+        command.extend(["-force_key_frames", ",".join(starts)])
+    command.extend([*video_encode_args(threads), "-flags", "+cgop", "-pix_fmt", PIX_FMT, "-an", output_file])
+    result = run_ffmpeg(
+        command, label=f"chunk {os.path.basename(output_file)}", duration=sum(duration for _, _, duration in parts)
+    )
+    if result.returncode != 0:
+        debug_print(f"❌ FFmpeg Error while encoding chunk {os.path.basename(output_file)}:\n{result.stderr}")
+        return False
+    return True
+
+
+def run_encode_chunk(parts, output_file, threads):
+    """Run encode_chunk locally, or on a worker when a job queue is set."""
+    if JOB_QUEUE is None:
+        return encode_chunk(parts, output_file, threads)
+    result = JOB_QUEUE.run(
+        "encode_chunk",
+        parts=[(JOB_QUEUE.to_shared(segment), start, duration) for segment, start, duration in parts],
+        output=JOB_QUEUE.to_shared(output_file),
+        threads=threads,
+        settings=task_settings(),
+    )
+    return bool(result.get("ok"))
+
+
+def encode_timeline_audio(segment_files, output_file):
+    """
+    Concatenate and encode the audio of all segments in one pass, so chunk joins have no audio gaps.
+    Returns True if successful, False otherwise.
+    """
+    command = ["ffmpeg", "-y"]
+    for segment in segment_files:
+        command.extend(["-i", segment])
+    pads = "".join(f"[{i}:a]" for i in range(len(segment_files)))
+    command.extend(
+        [
+            "-filter_complex",
+            f"{pads}concat=n={len(segment_files)}:v=0:a=1[a]",
+            "-map",
+            "[a]",
+            *aac_args(),
+            "-ac",
+            str(AUDIO_CHANNELS),
+            "-ar",
+            str(AUDIO_RATE),
             output_file,
         ]
-        result = subprocess.run(command, capture_output=True, text=True)
-        if result.returncode == 0:
-            debug_print(f"✅ Single file copied: {output_file}")
-        else:
+    )
+    result = run_ffmpeg(command, label="timeline audio", duration=timeline_duration(segment_files))
+    if result.returncode != 0:
+        debug_print(f"❌ FFmpeg Error while encoding timeline audio:\n{result.stderr}")
+        return False
+    return True
+
+
+def concatenate_chunked(normalized_files, output_file, base_id, chunks, music=None):
+    """
+    Re-encode a long timeline as parallel chunks and stitch them with stream copy.
+    Video chunks start with an IDR frame of a closed GOP, so joins are seamless;
+    audio is encoded once for the whole timeline and muxed in at the end
+    (with music, also mixed with the background bed for a second output, see finish_concat).
+    Returns True if successful, False otherwise.
+    """
+    plan = plan_chunks(normalized_files, chunks)
+    threads = resolve_threads(None, len(plan))
+    debug_print(f"⚙️ Encoding {base_id} as {len(plan)} chunks in parallel ({threads} threads each)")
+    with job_scratch(f"chunks_{base_id}") as work_dir:
+        chunk_files = [os.path.join(work_dir, f"chunk_{i}.mp4") for i in range(len(plan))]
+        audio_file = os.path.join(work_dir, "audio.m4a")
+        with ThreadPoolExecutor(max_workers=len(plan) + 1) as executor:
+            audio_future = executor.submit(encode_timeline_audio, normalized_files, audio_file)
+            futures = [
+                executor.submit(run_encode_chunk, parts, chunk_file, threads)
+                for parts, chunk_file in zip(plan, chunk_files)
+            ]
+            if not all(future.result() for future in futures) or not audio_future.result():
+                return False
+
+        list_file = os.path.join(work_dir, "chunks.txt")
+        with open(list_file, "w") as f:
+            for chunk_file in chunk_files:
+                escaped = chunk_file.replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        command = finish_concat(
+            ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_file, "-i", audio_file],
+            [],
+            "0:v",
+            "1:a",
+            ["-c:v", "copy"],
+            output_file,
+            music,
+            copy_audio=True,
+            faststart=True,
+        )
+        result = run_ffmpeg(command, label=f"stitch {base_id}", duration=timeline_duration(normalized_files))
+        if result.returncode != 0:
+            debug_print(f"❌ FFmpeg Error while stitching chunks for {base_id}:\n{result.stderr}")
+            return False
+        return True
+
+
+def concatenate_videos(normalized_files, output_file, base_id, fast_concat=None, music=None):
+    """
+    Helper function to concatenate normalized files into a single output.
+    With fast_concat, files with identical stream parameters are joined by stream copy;
+    otherwise (or if that fails) they are re-encoded through the concat filter.
+    With music (a background track), the version with music is written in the same pass
+    (see concatenate_with_music); if that fails, only the plain output is written.
+    The output is written to a temporary file and moved into place only on success.
+    Returns True if successful, False otherwise.
+    """
+    if fast_concat is None:
+        fast_concat = FAST_CONCAT
+    if len(normalized_files) < 1:
+        debug_print(f"❌ No valid files to concatenate for {base_id}")
+        return False
+
+    if music:
+        if concatenate_with_music(normalized_files, output_file, base_id, fast_concat, music):
+            return True
+        debug_print(f"⚠️ Could not mix background music into {base_id} while merging. Merging without it.")
+
+    temp_file = temp_output_path(output_file)
+    try:
+        with span(f"concatenate {base_id}", files=len(normalized_files)) as record:
+            mode = concatenate_to(normalized_files, temp_file, base_id, fast_concat)
+            record["mode"] = mode
+        if not mode or not commit_output(temp_file, output_file):
+            return False
+    finally:
+        discard_temp(temp_file)
+
+    write_manifest(output_file)
+    final_info = get_file_info(output_file)
+    debug_print(
+        f"✅ Merged ({mode}): {output_file} (Duration={final_info['duration']:.2f}s, Channels={final_info['channels']})"
+    )
+    return True
+
+
+def concatenate_with_music(normalized_files, output_file, base_id, fast_concat, bg_file):
+    """
+    Concatenate normalized_files and mix the background bed into a second copy in the same pass,
+    saving the separate decode, encode and write of bg.process_media. The music version goes
+    where process_media would write it: frappe/<id>.mp4 for assets, or the article itself
+    with the plain version in backup/. Returns True if successful, False otherwise.
+    """
+    music_file, backup_file = music_output_path(output_file)
+    plain_file = backup_file or output_file
+    duration = timeline_duration(normalized_files)
+    bed = timed_bed(bg_file, duration) if duration else None
+    if bed is None:
+        return False
+    music = {"bed": bed, "output": temp_output_path(music_file)}
+
+    temp_file = temp_output_path(plain_file)
+    try:
+        with span(f"concatenate {base_id}", files=len(normalized_files), music=True) as record:
+            mode = concatenate_to(normalized_files, temp_file, base_id, fast_concat, music)
+            record["mode"] = mode
+        if not mode or not commit_output(temp_file, plain_file):
+            return False
+        if not commit_output(music["output"], music_file, extra={"music": music_marker(plain_file, bg_file)}):
+            return False
+    finally:
+        discard_temp(temp_file)
+        discard_temp(music["output"])
+
+    write_manifest(plain_file)
+    if backup_file:
+        prune_backups(os.path.dirname(backup_file), keep=[backup_file])
+    debug_print(f"✅ Merged with background music ({mode}): {plain_file} and {music_file}")
+    return True
+
+
+def concatenate_to(normalized_files, output_file, base_id, fast_concat, music=None):
+    """
+    Write the concatenation of normalized_files to output_file using the fastest path that works,
+    and with music the version with background music in the same pass (see finish_concat).
+    Returns a description of the path used, or None on failure.
+    """
+    if len(normalized_files) == 1:
+        command = finish_concat(
+            ["ffmpeg", "-y", "-i", normalized_files[0]],
+            [],
+            "0:v:0",
+            "0:a:0",
+            ["-c:v", "copy"],
+            output_file,
+            music,
+            copy_audio=True,
+        )
+        result = run_ffmpeg(command, label=f"copy {base_id}")
+        if result.returncode != 0:
             debug_print(f"❌ Error copying single file {base_id}:\n{result.stderr}")
-        return
+            return None
+        return "single file copy"
+
+    if fast_concat:
+        if can_stream_copy(normalized_files):
+            if concatenate_copy(normalized_files, output_file, base_id, music):
+                return "stream copy"
+            debug_print(f"⚠️ Stream copy failed for {base_id}. Falling back to re-encoding.")
+        else:
+            debug_print(f"⚠️ Stream parameters differ for {base_id}. Falling back to re-encoding.")
+
+    if CHUNKS > 1:
+        if concatenate_chunked(normalized_files, output_file, base_id, CHUNKS, music):
+            return "chunked"
+        debug_print(f"⚠️ Chunked encoding failed for {base_id}. Falling back to a single encode.")
 
     # Use concat filter for precise merging
     command = ["ffmpeg", "-y"]
     for norm_file in normalized_files:
         command.extend(["-i", norm_file])
+    command = finish_concat(
+        command,
+        [f"{concat_pads(len(normalized_files))}concat=n={len(normalized_files)}:v=1:a=1[v][a]"],
+        "[v]",
+        "[a]",
+        [*keyframe_args(normalized_files), *video_encode_args(resolve_threads(None, 1)), "-pix_fmt", PIX_FMT],
+        output_file,
+        music,
+    )
+    result = run_ffmpeg(command, label=f"merge {base_id}", duration=timeline_duration(normalized_files))
+    if result.returncode != 0:
+        debug_print(f"❌ FFmpeg Error while merging {base_id}:\n{result.stderr}")
+        return None
+    return "re-encoded"
+
+
+def merge_single_pass(video_files, output_file, base_id, threads=None):
+    """
+    Scale, fps-convert, resample and concatenate all inputs in one ffmpeg graph,
+    producing the final output with a single encode and no intermediate files.
+    Inputs without audio get a silent track of the same duration.
+    Returns True if successful, False otherwise.
+    """
+    if threads is None:
+        threads = resolve_threads(None, 1)
+    if not video_files:
+        debug_print(f"❌ No valid files to merge for {base_id}")
+        return False
+    temp_file = temp_output_path(output_file)
+
+    command = ["ffmpeg", "-y"]
+    for video in video_files:
+        command.extend(["-i", video])
+
+    filters = []
+    silent_index = len(video_files)
+    total_duration = 0.0
+    for i, video in enumerate(video_files):
+        try:
+            input_has_audio = has_audio(video)
+            duration = get_duration(video)
+        except ProbeError as e:
+            debug_print(f"❌ {e}")
+            return False
+        total_duration += duration
+        filters.append(
+            f"[{i}:v]{video_filter()},format={PIX_FMT}[v{i}]"
+        )
+        if input_has_audio:
+            audio_source = f"[{i}:a]"
+        else:
+            command.extend(
+                [
+                    "-f",
+                    "lavfi",
+                    "-t",
+                    f"{duration:.3f}",
+                    "-i",
+                    f"anullsrc=channel_layout=stereo:sample_rate={AUDIO_RATE}",
+                ]
+            )
+            audio_source = f"[{silent_index}:a]"
+            silent_index += 1
+        filters.append(
+            f"{audio_source}aresample={AUDIO_RATE},aformat=channel_layouts=stereo,asetpts=PTS-STARTPTS[a{i}]"
+        )
+
+    pads = "".join(f"[v{i}][a{i}]" for i in range(len(video_files)))
+    filters.append(f"{pads}concat=n={len(video_files)}:v=1:a=1[v][a]")
+
     command.extend(
         [
             "-filter_complex",
-            f"[0:v][0:a][1:v][1:a]concat=n={len(normalized_files)}:v=1:a=1[v][a]",
+            ";".join(filters),
             "-map",
             "[v]",
             "-map",
             "[a]",
-            "-c:v",
-            "libx264",
-            "-r",
-            "60",
+            *keyframe_args(video_files),
+            *video_encode_args(threads),
             "-pix_fmt",
-            "yuv420p",
-            "-c:a",
-            "aac",
+            PIX_FMT,
+            *aac_args(),
             "-ac",
-            "2",
+            str(AUDIO_CHANNELS),
             "-ar",
-            "44100",
-            output_file,
+            str(AUDIO_RATE),
+            temp_file,
         ]
     )
-    result = subprocess.run(command, capture_output=True, text=True)
-    if result.returncode == 0:
-        final_info = get_file_info(output_file)
-        debug_print(
-            f"✅ Merged: {output_file} (Duration={final_info['duration']:.2f}s, Channels={final_info['channels']})"
-        )
-    else:
-        debug_print(f"❌ FFmpeg Error while merging {base_id}:\n{result.stderr}")
+
+    try:
+        result = run_ffmpeg(command, label=f"merge {base_id}", duration=total_duration)
+        if result.returncode != 0:
+            debug_print(f"❌ FFmpeg Error while merging {base_id} in a single pass:\n{result.stderr}")
+            return False
+        if not commit_output(temp_file, output_file):
+            return False
+    finally:
+        discard_temp(temp_file)
+    write_manifest(output_file)
+    final_info = get_file_info(output_file)
+    debug_print(
+        f"✅ Merged (single pass): {output_file} (Duration={final_info['duration']:.2f}s, Channels={final_info['channels']})"
+    )
+    return True
 
 
 def cleanup_title_video(asset_id, logger=None):
     """
-    Move the title video (_0.mp4) to trash after successful asset merging.
+    Move the title video (_0.mp4) and its completion marker to trash after successful asset merging.
     Only called for assets, not articles.
     """
     title_video_path = os.path.abspath(os.path.join("./pieces", f"{asset_id}_0.mp4"))
+    # A marker left behind would describe a file that is no longer there
+    title_marker_path = marker_path(title_video_path)
+    moved_paths = [title_video_path] + ([title_marker_path] if os.path.exists(title_marker_path) else [])
     
     # Check if title video exists
     if not os.path.exists(title_video_path):
@@ -299,7 +1280,7 @@ def cleanup_title_video(asset_id, logger=None):
             home_dir = os.path.expanduser("~")
             trash_dir = os.path.join(home_dir, ".Trash")
             trash_result = subprocess.run(
-                ["mv", title_video_path, trash_dir],
+                ["mv", *moved_paths, trash_dir],
                 capture_output=True,
                 text=True
             )
@@ -321,6 +1302,8 @@ def cleanup_title_video(asset_id, logger=None):
             os.makedirs(trash_dir, exist_ok=True)
             trash_path = os.path.join(trash_dir, f"{asset_id}_0.mp4")
             shutil.move(title_video_path, trash_path)
+            if os.path.exists(title_marker_path):
+                shutil.move(title_marker_path, marker_path(trash_path))
             if logger:
                 logger.info(f"Moved title video {title_video_path} to {trash_path}")
             else:
@@ -340,11 +1323,21 @@ def process_and_concatenate_videos(
 ):
     """
     Process and concatenate video files for an asset or article.
+    Intermediate files go to a private scratch directory that is removed when the job ends,
+    so several builds can run at the same time.
+    Returns True if successful, False otherwise.
+    """
+    job_name = f"asset_{asset_id}" if asset_id else f"article_{article_ids[0]}"
+    with job_scratch(job_name) as trash_dir:
+        return build_video(input_directory, output_directory, trash_dir, asset_id, article_ids)
+
+
+def build_video(input_directory, output_directory, trash_dir, asset_id=None, article_ids=None):
+    """
+    Build the asset or article video, keeping intermediate files in trash_dir.
     Returns True if successful, False otherwise.
     """
     os.makedirs(output_directory, exist_ok=True)
-    trash_dir = os.path.join("./pieces", "trash")  # Always use ./pieces/trash/
-    os.makedirs(trash_dir, exist_ok=True)
 
     video_files = []
     output_file = None
@@ -366,7 +1359,7 @@ def process_and_concatenate_videos(
         # Add intro
         intro_file = os.path.abspath("./articles/intro/intro.mp4")
         if os.path.exists(intro_file):
-            video_files.append(intro_file)
+            video_files.append(prepare_bumper(intro_file))
         else:
             debug_print(f"⚠️ Intro file {intro_file} not found. Proceeding without intro.")
 
@@ -384,7 +1377,7 @@ def process_and_concatenate_videos(
         # Add outro
         outro_file = os.path.abspath("./articles/outro/outro.mp4")
         if os.path.exists(outro_file):
-            video_files.append(outro_file)
+            video_files.append(prepare_bumper(outro_file))
         else:
             debug_print(f"⚠️ Outro file {outro_file} not found. Proceeding without outro.")
 
@@ -392,19 +1385,36 @@ def process_and_concatenate_videos(
             debug_print(f"❌ Insufficient valid files to process for article {article_id}")
             return False
 
+    # Rebuild only the changed segments of an existing article
+    if article_ids and INCREMENTAL and os.path.exists(build_record_path(output_file)):
+        backup_file = os.path.join(os.path.dirname(output_file), "backup", os.path.basename(output_file))
+        if incremental_rebuild(video_files, output_file, article_ids[0], trash_dir, reference_files=[backup_file]):
+            return True
+
+    # Mix background music in during the final concatenation
+    music = None
+    if MUSIC_IN_MERGE and not SINGLE_PASS:
+        if os.path.exists(BG_FILE):
+            music = BG_FILE
+        else:
+            debug_print(f"⚠️ Background audio {BG_FILE} not found. Merging without music.")
+
     # Normalize and concatenate
-    normalized_files = normalize_and_collect(video_files, asset_id or article_ids[0], trash_dir)
-    concatenate_videos(normalized_files, output_file, asset_id or article_ids[0])
+    if SINGLE_PASS:
+        segment_files = video_files
+        success = merge_single_pass(video_files, output_file, asset_id or article_ids[0])
+    else:
+        segment_files = normalize_and_collect(video_files, asset_id or article_ids[0], trash_dir)
+        success = concatenate_videos(segment_files, output_file, asset_id or article_ids[0], music=music)
 
     # Check if the final output file was created successfully
-    if not os.path.exists(output_file):
+    if not success:
         debug_print(f"❌ Final output file {output_file} was not created")
         return False
 
-    # Clean up trash directory after processing
-    shutil.rmtree(trash_dir)
-    os.makedirs(trash_dir)  # Recreate empty trash directory
-    
+    if article_ids and len(segment_files) == len(video_files):
+        write_build_record(output_file, video_files, segment_files)
+
     return True
 
 
@@ -416,6 +1426,8 @@ def merge_videos(args):
     if args.assets and args.articles:
         debug_print("❌ Error: Cannot use both --assets and --articles flags simultaneously.")
         return False
+
+    configure(args)
     
     if args.assets:
         # Validate --assets: Only one ID allowed
@@ -431,7 +1443,7 @@ def merge_videos(args):
         
         # Check if final output video already exists
         output_file = os.path.abspath(os.path.join("./assets", f"{asset_id}.mp4"))
-        if os.path.exists(output_file):
+        if is_complete(output_file):
             debug_print(f"✅ Final video {output_file} already exists. Skipping merge for asset {asset_id}.")
             return True
         
@@ -461,7 +1473,7 @@ def merge_videos(args):
         # Check if final output video already exists
         article_id = article_ids[0]
         output_file = os.path.abspath(os.path.join("./articles", f"{article_id}.mp4"))
-        if os.path.exists(output_file):
+        if not INCREMENTAL and is_complete(output_file):
             debug_print(f"✅ Final video {output_file} already exists. Skipping merge for article {article_id}.")
             return True
         
@@ -485,7 +1497,74 @@ if __name__ == "__main__":
         type=str,
         help="Comma-separated list of article and asset IDs (e.g., 34,23,45,56,67)",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of pieces to normalize in parallel (0 = auto, default: 1)",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        help="FFmpeg threads per normalization job (default: CPU count / workers)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not use the persistent cache of normalized clips",
+    )
+    parser.add_argument(
+        "--reencode-concat",
+        action="store_true",
+        help="Always re-encode when concatenating instead of stream-copying matching clips",
+    )
+    parser.add_argument(
+        "--single-pass",
+        action="store_true",
+        help="Normalize and concatenate in one ffmpeg encode without intermediate files",
+    )
+    parser.add_argument(
+        "--screen",
+        action="store_true",
+        help="Screen-content mode: drop duplicate frames and encode with variable frame rate",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Rebuild an existing article, re-encoding only segments whose source changed",
+    )
+    parser.add_argument(
+        "--chunks",
+        type=int,
+        help="Re-encode long timelines as N parallel chunks (0 = CPU count, default: 1)",
+    )
+    parser.add_argument(
+        "--music-in-merge",
+        action="store_true",
+        help="Also write the version with background music in the final concatenation pass",
+    )
+    parser.add_argument(
+        "--scratch-dir",
+        type=str,
+        help="Directory for per-job intermediate files (default: ./pieces/trash)",
+    )
+    parser.add_argument(
+        "--tmpfs",
+        action="store_true",
+        help="Keep intermediate files in RAM (/dev/shm) instead of on disk",
+    )
+    parser.add_argument(
+        "--scratch-quota",
+        type=float,
+        help="GB of scratch space shared by all running jobs; new jobs wait while it is full (default: 50)",
+    )
+    parser.add_argument(
+        "--asset-jobs",
+        type=int,
+        help="Missing assets to build in parallel for an article (0 = auto, default: 0)",
+    )
+    add_profile_argument(parser)
     args = parser.parse_args()
+    set_profile(args.profile)
     
     if not args.assets and not args.articles:
         print("❌ Error: Must provide either --assets or --articles flag.")
@@ -0,0 +1,189 @@
+import json
+import os
+
+from modules import trace
+from modules.cache import CACHE_DIR, JsonStore
+
+# Import debug mode from main
+try:
+    from main import DEBUG_MODE
+except ImportError:
+    DEBUG_MODE = False
+
+def debug_print(message):
+    """Print message only in debug mode."""
+    if DEBUG_MODE:
+        print(message)
+
+# Probe results are cached by (path, size, mtime), in memory and on disk
+PROBE_CACHE_FILE = os.path.join(CACHE_DIR, "probe.json")
+PROBE_VERSION = 2  # Bump when the ffprobe command changes, so older cached results are not reused
+
+_probe_cache = JsonStore(PROBE_CACHE_FILE, keep=os.path.exists)
+
+
+class ProbeError(Exception):
+    """Raised when ffprobe cannot read a file."""
+
+
+def probe(input_file):
+    """
+    Run ffprobe once on a file and return its full format and stream info
+    ({"format": {...}, "streams": [...]}). Raises ProbeError if the file cannot be read.
+    """
+    path = os.path.abspath(input_file)
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        raise ProbeError(f"Cannot probe {input_file}: {e}")
+    stamp = [stat.st_size, stat.st_mtime_ns, PROBE_VERSION]
+
+    entry = _probe_cache.get(path)
+    if entry and entry["stamp"] == stamp:
+        return entry["data"]
+
+    command = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-show_format",
+        "-show_streams",
+        "-show_data_hash",
+        "sha256",  # Adds extradata_hash (e.g. the H.264 SPS/PPS) to each stream
+        "-of",
+        "json",
+        path,
+    ]
+    result = trace.run(command, name=f"ffprobe {os.path.basename(path)}", category="ffprobe")
+    if result.returncode != 0:
+        raise ProbeError(f"ffprobe failed for {input_file}: {result.stderr.strip()}")
+    try:
+        data = json.loads(result.stdout)
+    except json.JSONDecodeError as e:
+        raise ProbeError(f"Invalid ffprobe output for {input_file}: {e}")
+    data.setdefault("format", {})
+    data.setdefault("streams", [])
+
+    _probe_cache.set(path, {"stamp": stamp, "data": data})
+    return data
+
+
+def forget(input_file):
+    """Drop the cached probe result of a file (e.g. a temporary file that was deleted)."""
+    _probe_cache.pop(os.path.abspath(input_file))
+
+
+def moved(old_file, new_file):
+    """
+    Carry the cached probe result of a file over to the path it was renamed to,
+    so the renamed file is not probed again (a rename keeps its size and mtime).
+    """
+    _probe_cache.move(os.path.abspath(old_file), os.path.abspath(new_file))
+
+
+def forget_tree(directory):
+    """Drop the cached probe results of all files under a directory (e.g. a scratch directory being removed)."""
+    _probe_cache.pop_prefix(os.path.join(os.path.abspath(directory), ""))
+
+
+def get_streams(input_file, codec_type):
+    """Return the streams of one type ("video" or "audio") in a file."""
+    return [s for s in probe(input_file)["streams"] if s.get("codec_type") == codec_type]
+
+
+def has_audio(input_file):
+    """Check if the file has an audio stream."""
+    return bool(get_streams(input_file, "audio"))
+
+
+def get_duration(input_file):
+    """Return the container duration in seconds."""
+    return float(probe(input_file)["format"].get("duration", 0.0))
+
+
+def get_video_packets(input_file):
+    """
+    Return the (time, is_keyframe) of every packet of the first video stream, in presentation order,
+    with times in seconds from the start of the file (the position input -ss seeks to).
+    Raises ProbeError if the file cannot be read.
+    """
+    command = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-select_streams",
+        "v:0",
+        "-show_entries",
+        "packet=pts_time,flags",
+        "-of",
+        "json",
+        os.path.abspath(input_file),
+    ]
+    result = trace.run(command, name=f"packets {os.path.basename(input_file)}", category="ffprobe")
+    if result.returncode != 0:
+        raise ProbeError(f"ffprobe failed for {input_file}: {result.stderr.strip()}")
+    try:
+        packets = json.loads(result.stdout).get("packets", [])
+        start = float(probe(input_file)["format"].get("start_time", 0.0))
+        times = [
+            (float(packet["pts_time"]) - start, "K" in packet.get("flags", ""))
+            for packet in packets
+            if packet.get("pts_time") not in (None, "N/A")
+        ]
+    except (json.JSONDecodeError, ValueError) as e:
+        raise ProbeError(f"Invalid ffprobe output for {input_file}: {e}")
+    return sorted(times)
+
+
+def get_file_info(input_file):
+    """
+    Get a summary of a file (duration, video frame rate, audio sample rate and channels).
+    """
+    try:
+        data = probe(input_file)
+        duration = float(data["format"].get("duration", 0.0))
+        video_fps = None
+        audio_rate = None
+        audio_channels = None
+        for stream in data["streams"]:
+            if stream.get("codec_type") == "video":
+                num, denom = stream["r_frame_rate"].split("/")
+                video_fps = float(num) / float(denom)
+            elif stream.get("codec_type") == "audio":
+                audio_rate = int(stream.get("sample_rate", 0))
+                audio_channels = int(stream.get("channels", 0))
+        return {
+            "duration": duration,
+            "fps": video_fps,
+            "audio_rate": audio_rate,
+            "channels": audio_channels,
+        }
+    except (ProbeError, ValueError, KeyError, ZeroDivisionError) as e:
+        print(f"⚠️ Error parsing ffprobe output for {input_file}: {e}")
+        return {"duration": 0.0, "fps": None, "audio_rate": None, "channels": None}
+
+
+def get_stream_signature(input_file, include_frame_rate=True):
+    """
+    Get the stream parameters that must match for files to be joined with stream copy.
+    Set include_frame_rate=False for variable frame rate clips.
+    The codec extradata (H.264 SPS/PPS, AAC config) is compared too: an mp4 joined by stream copy
+    keeps only the first clip's, so clips from other encoders would decode corrupted.
+    Returns a tuple of per-stream tuples, or None if the file cannot be probed.
+    """
+    try:
+        streams = probe(input_file)["streams"]
+    except ProbeError:
+        return None
+    signature = []
+    for stream in streams:
+        if stream.get("codec_type") == "video":
+            keys = ("codec_name", "profile", "level", "width", "height", "pix_fmt", "time_base", "extradata_hash")
+            if include_frame_rate:
+                keys += ("r_frame_rate",)
+        elif stream.get("codec_type") == "audio":
+            keys = ("codec_name", "profile", "sample_rate", "channels", "channel_layout", "time_base", "extradata_hash")
+        else:
+            continue
+        signature.append((stream["codec_type"],) + tuple(stream.get(key) for key in keys))
+    return tuple(signature)
@@ -0,0 +1,111 @@
+# Import debug mode from main
+try:
+    from main import DEBUG_MODE
+except ImportError:
+    DEBUG_MODE = False
+
+def debug_print(message):
+    """Print message only in debug mode."""
+    if DEBUG_MODE:
+        print(message)
+
+# Encoding profiles for every libx264 encode in the pipeline.
+# threads: 0 lets ffmpeg decide; per-job budgets (e.g. merge --threads) take precedence.
+PROFILES = {
+    "draft": {
+        "preset": "ultrafast",
+        "crf": 28,
+        "tune": "fastdecode",
+        "threads": 0,
+        "audio_bitrate": "128k",
+    },
+    "default": {
+        "preset": "medium",
+        "crf": 23,
+        "tune": None,
+        "threads": 0,
+        "audio_bitrate": "192k",
+    },
+    "final": {
+        "preset": "slow",
+        "crf": 18,
+        "tune": "animation",  # Flat UI content in screen recordings
+        "threads": 0,
+        "audio_bitrate": "192k",
+    },
+}
+DEFAULT_PROFILE = "default"
+
+_current_profile = DEFAULT_PROFILE
+
+
+def set_profile(name):
+    """Select the encoding profile used by all modules."""
+    global _current_profile
+    if name not in PROFILES:
+        raise ValueError(f"Unknown encoding profile '{name}'. Choose from: {', '.join(PROFILES)}")
+    _current_profile = name
+    debug_print(f"🎛️ Using '{name}' encoding profile")
+
+
+def get_profile_name():
+    """Return the name of the current encoding profile."""
+    return _current_profile
+
+
+def get_profile():
+    """Return the settings of the current encoding profile."""
+    return PROFILES[_current_profile]
+
+
+def x264_args(threads=None, tune=None):
+    """
+    Build the ffmpeg output arguments for a libx264 encode with the current profile.
+    threads and tune override the profile's thread count and tuning.
+    """
+    profile = get_profile()
+    args = ["-c:v", "libx264", "-preset", profile["preset"], "-crf", str(profile["crf"])]
+    tune = tune or profile["tune"]
+    if tune:
+        args.extend(["-tune", tune])
+    threads = threads or profile["threads"]
+    if threads:
+        args.extend(["-threads", str(threads)])
+    return args
+
+
+def aac_args():
+    """Build the ffmpeg output arguments for an AAC encode with the current profile."""
+    return ["-c:a", "aac", "-b:a", get_profile()["audio_bitrate"]]
+
+
+def aac_kwargs():
+    """Build ffmpeg-python output keyword arguments for an AAC encode with the current profile."""
+    return {"acodec": "aac", "audio_bitrate": get_profile()["audio_bitrate"]}
+
+
+def x264_kwargs():
+    """Build ffmpeg-python output keyword arguments for libx264 + AAC with the current profile."""
+    profile = get_profile()
+    kwargs = {
+        "vcodec": "libx264",
+        "preset": profile["preset"],
+        "crf": profile["crf"],
+        **aac_kwargs(),
+    }
+    if profile["tune"]:
+        kwargs["tune"] = profile["tune"]
+    if profile["threads"]:
+        kwargs["threads"] = profile["threads"]
+    return kwargs
+
+
+def add_profile_argument(parser):
+    """Add the --profile option to an argparse parser."""
+    parser.add_argument(
+        "--profile",
+        choices=list(PROFILES),
+        default=DEFAULT_PROFILE,
+        help="Encoding profile: draft (fast previews), default, or final (slow, high quality)",
+    )
+
@@ -0,0 +1,225 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+from modules import trace
+from modules.probe import ProbeError, get_duration
+
+# Import debug mode from main
+try:
+    from main import DEBUG_MODE
+except ImportError:
+    DEBUG_MODE = False
+
+def debug_print(message):
+    """Print message only in debug mode."""
+    if DEBUG_MODE:
+        print(message)
+
+# Console progress: one status line for all running jobs on a terminal, periodic lines otherwise
+CONSOLE_PROGRESS = True  # Turned off with --no-progress
+CONSOLE_INTERVAL = 0.5  # seconds between status line redraws
+LOG_INTERVAL = 10  # seconds between progress lines per job when not on a terminal
+
+_lock = threading.Lock()
+_active = {}  # job id -> progress dict of every running ffmpeg job
+_listeners = []
+_last_draw = 0.0
+_last_logged = {}  # job id -> time of its last progress line (not on a terminal)
+
+
+def set_console_progress(enabled):
+    """Turn the console progress display on or off."""
+    global CONSOLE_PROGRESS
+    CONSOLE_PROGRESS = enabled
+
+
+def add_listener(callback):
+    """
+    Call callback(progress) on every progress update of every ffmpeg job.
+    progress is a dict with the keys job, frame, fps, speed, size (bytes), out_time and
+    duration (seconds), percent and eta (None when the duration is unknown), elapsed and done.
+    """
+    with _lock:
+        _listeners.append(callback)
+
+
+def remove_listener(callback):
+    """Stop calling a callback registered with add_listener."""
+    with _lock:
+        if callback in _listeners:
+            _listeners.remove(callback)
+
+
+def active_jobs():
+    """Return a snapshot of the progress of all running ffmpeg jobs."""
+    with _lock:
+        return [dict(progress) for progress in _active.values()]
+
+
+def format_eta(seconds):
+    """Format seconds as M:SS or H:MM:SS."""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def format_progress(progress):
+    """Format a progress dict as a short human readable status."""
+    parts = [progress["job"]]
+    if progress["percent"] is not None:
+        parts.append(f"{progress['percent']:.0f}%")
+    parts.append(f"{progress['fps']:.0f} fps")
+    parts.append(f"{progress['speed']:.1f}x")
+    parts.append(f"{progress['size'] / 1024 ** 2:.1f} MB")
+    if progress["eta"] is not None:
+        parts.append(f"ETA {format_eta(progress['eta'])}")
+    return " ".join(parts)
+
+
+def _console(job_id, progress):
+    """Default listener: draw the progress of all running jobs on the console."""
+    global _last_draw
+    if not CONSOLE_PROGRESS:
+        return
+    now = time.time()
+    if sys.stdout.isatty():
+        if progress["done"] and not _active:
+            sys.stdout.write("\r\033[K")  # Clear the status line once the last job ends
+        elif now - _last_draw >= CONSOLE_INTERVAL:
+            status = " | ".join(format_progress(p) for p in _active.values())
+            sys.stdout.write(f"\r\033[K⏳ {status}")
+        else:
+            return
+    elif progress["done"] or now - _last_logged.get(job_id, 0.0) >= LOG_INTERVAL:
+        _last_logged[job_id] = now
+        if progress["done"]:
+            _last_logged.pop(job_id)
+        print(f"⏳ {format_progress(progress)}{' (done)' if progress['done'] else ''}")
+    sys.stdout.flush()
+    _last_draw = now
+
+
+def _parse_time(value):
+    """Parse an ffmpeg out_time_us value (microseconds) into seconds."""
+    try:
+        return max(0.0, int(value) / 1_000_000)
+    except (TypeError, ValueError):
+        return 0.0  # "N/A" before the first frame is written
+
+
+def _parse_float(value):
+    try:
+        return float(str(value).rstrip("x"))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _guess_duration(command):
+    """Guess the output duration of a command: its -t option, or the duration of its first input."""
+    if "-t" in command:
+        return _parse_float(command[command.index("-t") + 1]) or None
+    if "-i" in command:
+        try:
+            return get_duration(command[command.index("-i") + 1]) or None
+        except (ProbeError, ValueError, IndexError):
+            return None
+    return None
+
+
+def _update(progress, block, started):
+    """Update a progress dict from one block of ffmpeg -progress output."""
+    progress["frame"] = int(_parse_float(block.get("frame")))
+    progress["fps"] = _parse_float(block.get("fps"))
+    progress["speed"] = _parse_float(block.get("speed"))
+    progress["size"] = int(_parse_float(block.get("total_size")))
+    progress["out_time"] = _parse_time(block.get("out_time_us", block.get("out_time_ms")))
+    progress["elapsed"] = time.time() - started
+    duration = progress["duration"]
+    if duration:
+        done = min(progress["out_time"], duration)
+        progress["percent"] = 100.0 * done / duration
+        if done > 0:
+            progress["eta"] = progress["elapsed"] * (duration - done) / done
+
+
+def _publish(job_id, progress, callback):
+    with _lock:
+        if progress["done"]:
+            _active.pop(job_id, None)
+        listeners = [*_listeners, callback] if callback else list(_listeners)
+        snapshot = dict(progress)
+        try:
+            _console(job_id, progress)
+        except OSError:
+            pass  # Console closed
+    for listener in listeners:
+        try:
+            listener(snapshot)
+        except Exception as e:
+            debug_print(f"⚠️ Progress listener failed: {e}")
+
+
+def run_ffmpeg(command, label=None, duration=None, callback=None):
+    """
+    Run an ffmpeg command (a list starting with "ffmpeg"), reporting fps, speed, output size
+    and ETA while it runs, to the console and to listeners (see add_listener) and callback.
+    duration is the expected output duration in seconds; by default it is taken from -t or
+    the first input. Several jobs can run at once from different threads.
+    Returns a subprocess.CompletedProcess with the captured stderr, like
+    subprocess.run(command, capture_output=True, text=True).
+    """
+    command = [command[0], "-progress", "pipe:1", "-nostats", *command[1:]]
+    if label is None:
+        label = os.path.basename(command[-1])
+    if duration is None:
+        duration = _guess_duration(command)
+    progress = {
+        "job": label,
+        "frame": 0,
+        "fps": 0.0,
+        "speed": 0.0,
+        "size": 0,
+        "out_time": 0.0,
+        "duration": duration,
+        "percent": None,
+        "eta": None,
+        "elapsed": 0.0,
+        "done": False,
+    }
+    started = time.time()
+    stderr = []
+    with trace.span(label, "ffmpeg", command=command) as record:
+        process = subprocess.Popen(
+            command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+        job_id = uuid.uuid4().hex
+        with _lock:
+            _active[job_id] = progress
+        # Drain stderr on another thread so a chatty ffmpeg never blocks on a full pipe
+        reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+        reader.start()
+        try:
+            block = {}
+            for line in process.stdout:
+                key, _, value = line.strip().partition("=")
+                block[key] = value
+                if key == "progress":
+                    _update(progress, block, started)
+                    _publish(job_id, progress, callback)
+                    block = {}
+            trace.wait_process(process, record)
+            reader.join()
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            progress["elapsed"] = time.time() - started
+            progress["done"] = True
+            _publish(job_id, progress, callback)
+        record.update({"returncode": process.returncode, "output_size": progress["size"]})
+    return subprocess.CompletedProcess(command, process.returncode, "", "".join(stderr))
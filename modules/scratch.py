@@ -0,0 +1,148 @@
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from modules.probe import forget_tree
+
+# Import debug mode from main
+try:
+    from main import DEBUG_MODE
+except ImportError:
+    DEBUG_MODE = False
+
+def debug_print(message):
+    """Print message only in debug mode."""
+    if DEBUG_MODE:
+        print(message)
+
+# Every pipeline job gets its own directory under the scratch root, removed when the job ends
+SCRATCH_ROOT = os.path.join("./pieces", "trash")
+TMPFS_ROOT = "/dev/shm/video-pipeline"  # RAM-backed scratch root used with --tmpfs
+SCRATCH_QUOTA_BYTES = 50 * 1024 ** 3  # 50 GB across all jobs sharing the scratch root
+QUOTA_POLL_INTERVAL = 2  # seconds
+OWNER_FILE = ".owner.json"
+
+_local = threading.local()
+
+
+def configure(args):
+    """
+    Apply scratch options from the command line (--scratch-dir, --tmpfs, --scratch-quota).
+    Options that are not set keep their module defaults.
+    """
+    global SCRATCH_ROOT, SCRATCH_QUOTA_BYTES
+    if getattr(args, "scratch_dir", None):
+        SCRATCH_ROOT = args.scratch_dir
+    elif getattr(args, "tmpfs", False):
+        if os.path.isdir(os.path.dirname(TMPFS_ROOT)):
+            SCRATCH_ROOT = TMPFS_ROOT
+        else:
+            debug_print(f"⚠️ {os.path.dirname(TMPFS_ROOT)} not found. Using {SCRATCH_ROOT} for scratch files.")
+    if getattr(args, "scratch_quota", None) is not None:
+        SCRATCH_QUOTA_BYTES = int(args.scratch_quota * 1024 ** 3)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _job_dirs(root):
+    """Yield (path, owner) for every job directory under root."""
+    if not os.path.isdir(root):
+        return
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        try:
+            with open(os.path.join(path, OWNER_FILE), "r") as f:
+                yield path, json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue  # Not a job directory (e.g. title videos moved to trash)
+
+
+def _dir_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass  # Deleted while we were walking
+    return total
+
+
+def scratch_usage(root=None):
+    """Return the bytes used by all job directories under the scratch root."""
+    return sum(_dir_size(path) for path, _ in _job_dirs(root or SCRATCH_ROOT))
+
+
+def cleanup_stale(root=None):
+    """Remove job directories left behind by crashed processes on this host."""
+    host = socket.gethostname()
+    for path, owner in _job_dirs(root or SCRATCH_ROOT):
+        if owner.get("host") == host and not _pid_alive(owner.get("pid", 0)):
+            debug_print(f"🧹 Removing stale scratch directory {path}")
+            shutil.rmtree(path, ignore_errors=True)
+            forget_tree(path)
+
+
+def wait_for_quota(root=None):
+    """Block until the scratch root is below SCRATCH_QUOTA_BYTES."""
+    root = root or SCRATCH_ROOT
+    announced = False
+    while True:
+        cleanup_stale(root)
+        usage = scratch_usage(root)
+        if usage < SCRATCH_QUOTA_BYTES:
+            return
+        if not announced:
+            print(
+                f"⏳ Scratch space {root} is full ({usage / 1024 ** 3:.1f} of "
+                f"{SCRATCH_QUOTA_BYTES / 1024 ** 3:.1f} GB). Waiting for other jobs to finish..."
+            )
+            announced = True
+        time.sleep(QUOTA_POLL_INTERVAL)
+
+
+def current_scratch():
+    """Return the scratch directory of the job running in this thread, or None."""
+    return getattr(_local, "current", None)
+
+
+@contextmanager
+def job_scratch(name, parent=None):
+    """
+    Create a private scratch directory for a job and remove it when the job ends.
+    Top-level jobs wait for the global scratch quota first; jobs started inside
+    another job (e.g. an asset built for an article) get a subdirectory of it.
+    Pass parent=current_scratch() when starting a nested job on another thread.
+    """
+    previous = current_scratch()
+    parent = parent or previous
+    if parent is None:
+        os.makedirs(SCRATCH_ROOT, exist_ok=True)
+        wait_for_quota()
+        path = os.path.abspath(tempfile.mkdtemp(prefix=f"{name}.", dir=SCRATCH_ROOT))
+        with open(os.path.join(path, OWNER_FILE), "w") as f:
+            json.dump({"host": socket.gethostname(), "pid": os.getpid(), "job": name, "started": time.time()}, f)
+    else:
+        path = tempfile.mkdtemp(prefix=f"{name}.", dir=parent)
+
+    _local.current = path
+    debug_print(f"📁 Scratch directory for {name}: {path}")
+    try:
+        yield path
+    finally:
+        _local.current = previous
+        shutil.rmtree(path, ignore_errors=True)
+        forget_tree(path)
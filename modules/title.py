@@ -2,9 +2,13 @@
 
 import argparse
 import os
-import subprocess
 import sys
 
+from modules.atomic import commit_output, discard_temp, is_complete, temp_output_path
+from modules.index import has_file
+from modules.profiles import aac_args, add_profile_argument, set_profile, x264_args
+from modules.progress import run_ffmpeg
+
 # Import debug mode from main
 try:
     from main import DEBUG_MODE
@@ -31,6 +35,7 @@ def parse_args():
     parser.add_argument(
         "--articles", type=str, help="Comma-separated article and asset IDs (e.g., 11,24,55,65)"
     )
+    add_profile_argument(parser)
     return parser.parse_args()
 
 
@@ -44,6 +49,8 @@ def validate_id(id_str):
 
 def check_and_get_input_path(base_dir, id_str):
     file_path = os.path.join(base_dir, "title", f"{id_str}.png")
+    if has_file(os.path.join(base_dir, "title"), f"{id_str}.png"):
+        return file_path
     while not os.path.exists(file_path):
         debug_print(f"Error: {file_path} not found")
         response = (
@@ -59,6 +66,8 @@ def check_and_get_input_path(base_dir, id_str):
 def create_video(input_path, output_path):
     # Create output directory if it doesn't exist
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    # Write to a temporary file so an interrupted run never leaves a truncated video behind
+    temp_path = temp_output_path(output_path)
 
     # FFmpeg command
     ffmpeg_cmd = [
@@ -71,28 +80,27 @@ def create_video(input_path, output_path):
         "lavfi",
         "-i",
         "anullsrc=channel_layout=stereo:sample_rate=44100",
-        "-c:v",
-        "libx264",
+        *x264_args(),
         "-t",
         str(DURATION),
         "-r",
         str(FPS),
         "-vf",
         f"scale={WIDTH}:{HEIGHT}:force_original_aspect_ratio=decrease,pad={WIDTH}:{HEIGHT}:-1:-1:color=black",
-        "-c:a",
-        "aac",
+        *aac_args(),
         "-shortest",
         "-y",  # Overwrite output without asking
-        output_path,
+        temp_path,
     ]
 
     try:
-        subprocess.run(
-            ffmpeg_cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        )
-        debug_print(f"Successfully created {output_path}")
-    except subprocess.CalledProcessError as e:
-        debug_print(f"Error creating {output_path}: {e.stderr.decode()}")
+        result = run_ffmpeg(ffmpeg_cmd, label=f"title {os.path.basename(output_path)}")
+        if result.returncode != 0:
+            debug_print(f"Error creating {output_path}: {result.stderr}")
+        elif commit_output(temp_path, output_path):
+            debug_print(f"Successfully created {output_path}")
+    finally:
+        discard_temp(temp_path)
 
 
 def process_items(items, input_base, output_base):
@@ -109,7 +117,7 @@ def process_items(items, input_base, output_base):
 
         # Check if output video already exists
         output_path = os.path.join(output_base, f"{item}_0.mp4")
-        if os.path.exists(output_path):
+        if has_file(output_base, f"{item}_0.mp4") and is_complete(output_path):
             debug_print(f"✅ Title video {output_path} already exists. Skipping {input_base.split('/')[-1]} {item}.")
             continue
 
@@ -138,4 +146,5 @@ def convert_titles(args):
 
 if __name__ == "__main__":
     args = parse_args()
+    set_profile(args.profile)
     convert_titles(args)
@@ -0,0 +1,237 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Import debug mode from main
+try:
+    from main import DEBUG_MODE
+except ImportError:
+    DEBUG_MODE = False
+
+def debug_print(message):
+    """Print message only in debug mode."""
+    if DEBUG_MODE:
+        print(message)
+
+# Tracing is off until start_trace() is called (main.py --trace)
+TRACE_FILE = None  # JSON-lines file spans are appended to
+RUN_ID = None
+BLOCK_SIZE = 512  # ru_inblock/ru_oublock count 512-byte blocks
+RSS_UNIT = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KB elsewhere
+
+_lock = threading.Lock()
+_spans = []
+
+
+def start_trace(trace_file):
+    """Start recording spans of this run, appending them to trace_file (JSON lines)."""
+    global TRACE_FILE, RUN_ID
+    directory = os.path.dirname(os.path.abspath(trace_file))
+    os.makedirs(directory, exist_ok=True)
+    TRACE_FILE = os.path.abspath(trace_file)
+    RUN_ID = f"{int(time.time())}_{uuid.uuid4().hex[:8]}"
+    debug_print(f"📈 Tracing run {RUN_ID} to {trace_file}")
+
+
+def chrome_trace_path(trace_file):
+    """Return the Chrome trace path written next to a JSON-lines trace file."""
+    return f"{os.path.splitext(trace_file)[0]}.trace.json"
+
+
+def finish_trace():
+    """Write the spans of this run in Chrome trace-event format and stop tracing."""
+    global TRACE_FILE
+    if TRACE_FILE is None:
+        return
+    with _lock:
+        spans = list(_spans)
+        _spans.clear()
+    write_chrome_trace(spans, chrome_trace_path(TRACE_FILE))
+    debug_print(f"📈 Wrote {len(spans)} spans to {chrome_trace_path(TRACE_FILE)}")
+    TRACE_FILE = None
+
+
+def _usage():
+    """Return (cpu seconds, peak RSS bytes, bytes read, bytes written) of this process and its reaped children."""
+    if resource is None:
+        return time.process_time(), 0, 0, 0
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (
+        own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime,
+        max(own.ru_maxrss, children.ru_maxrss) * RSS_UNIT,
+        (own.ru_inblock + children.ru_inblock) * BLOCK_SIZE,
+        (own.ru_oublock + children.ru_oublock) * BLOCK_SIZE,
+    )
+
+
+def _record(entry):
+    line = json.dumps(entry)
+    with _lock:
+        _spans.append(entry)
+        with open(TRACE_FILE, "a") as f:
+            f.write(line + "\n")
+
+
+@contextmanager
+def span(name, category="stage", **args):
+    """
+    Record a span around a block: wall time, CPU time, peak RSS and block I/O
+    of this process and the children it reaped meanwhile. The yielded dict can be
+    updated with more fields; wait_process() fills it with the usage of one child.
+    Does nothing while tracing is off.
+    """
+    record = {}
+    if TRACE_FILE is None:
+        yield record
+        return
+    start = time.time()
+    cpu, _, read_bytes, write_bytes = _usage()
+    try:
+        yield record
+    finally:
+        end_cpu, max_rss, end_read, end_write = _usage()
+        entry = {
+            "run": RUN_ID,
+            "name": name,
+            "cat": category,
+            "start": start,
+            "wall": time.time() - start,
+            "cpu": end_cpu - cpu,
+            "max_rss": max_rss,
+            "read_bytes": end_read - read_bytes,
+            "write_bytes": end_write - write_bytes,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        entry.update(record)
+        _record(entry)
+
+
+def wait_process(process, record=None):
+    """
+    Wait for a subprocess.Popen like process.wait() and return its exit code,
+    storing the child's own CPU time, peak RSS and block I/O in a span record.
+    """
+    if not hasattr(os, "wait4"):
+        return process.wait()
+    try:
+        _, status, usage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        return process.wait()  # Already reaped
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if record is not None:
+        record.update(
+            {
+                "cpu": usage.ru_utime + usage.ru_stime,
+                "max_rss": usage.ru_maxrss * RSS_UNIT,
+                "read_bytes": usage.ru_inblock * BLOCK_SIZE,
+                "write_bytes": usage.ru_oublock * BLOCK_SIZE,
+            }
+        )
+    return process.returncode
+
+
+def run(command, name=None, category="process"):
+    """
+    Run a command like subprocess.run(command, capture_output=True, text=True),
+    recording it as a span with the child's resource usage.
+    """
+    with span(name or os.path.basename(command[0]), category, command=command) as record:
+        process = subprocess.Popen(
+            command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+        output = {}
+        readers = [
+            threading.Thread(target=lambda key=key, pipe=pipe: output.__setitem__(key, pipe.read()), daemon=True)
+            for key, pipe in (("stdout", process.stdout), ("stderr", process.stderr))
+        ]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join()
+        returncode = wait_process(process, record)
+        record["returncode"] = returncode
+    return subprocess.CompletedProcess(command, returncode, output.get("stdout", ""), output.get("stderr", ""))
+
+
+def load_spans(trace_file, run_id=None):
+    """Read spans from a JSON-lines trace file, optionally only those of one run."""
+    spans = []
+    with open(trace_file, "r") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                if run_id is None or entry.get("run") == run_id:
+                    spans.append(entry)
+    return spans
+
+
+def write_chrome_trace(spans, output_file):
+    """Write spans as Chrome trace events (open in chrome://tracing or https://ui.perfetto.dev)."""
+    events = []
+    for entry in spans:
+        args = dict(entry.get("args", {}))
+        for key in ("run", "cpu", "max_rss", "read_bytes", "write_bytes", "returncode"):
+            if key in entry:
+                args[key] = entry[key]
+        events.append(
+            {
+                "name": entry["name"],
+                "cat": entry["cat"],
+                "ph": "X",
+                "ts": int(entry["start"] * 1_000_000),
+                "dur": int(entry["wall"] * 1_000_000),
+                "pid": entry["pid"],
+                "tid": entry["tid"],
+                "args": args,
+            }
+        )
+    tmp_path = f"{output_file}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    os.replace(tmp_path, output_file)
+
+
+def summarize(spans):
+    """Print total wall time, CPU time and I/O per category and per stage."""
+    totals = {}
+    for entry in spans:
+        key = entry["cat"] if entry["cat"] != "stage" else f"stage: {entry['name']}"
+        total = totals.setdefault(key, {"count": 0, "wall": 0.0, "cpu": 0.0, "read": 0, "written": 0})
+        total["count"] += 1
+        total["wall"] += entry["wall"]
+        total["cpu"] += entry["cpu"]
+        total["read"] += entry["read_bytes"]
+        total["written"] += entry["write_bytes"]
+    print(f"{'span':<40} {'count':>6} {'wall s':>10} {'cpu s':>10} {'read MB':>9} {'write MB':>9}")
+    for key, total in sorted(totals.items(), key=lambda item: -item[1]["wall"]):
+        print(
+            f"{key:<40} {total['count']:>6} {total['wall']:>10.1f} {total['cpu']:>10.1f} "
+            f"{total['read'] / 1024 ** 2:>9.1f} {total['written'] / 1024 ** 2:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a pipeline trace or convert it to Chrome trace format")
+    parser.add_argument("trace_file", help="JSON-lines trace written by main.py --trace")
+    parser.add_argument("--run", type=str, help="Only use spans of this run ID")
+    parser.add_argument("--chrome", type=str, help="Write the spans in Chrome trace-event format to this file")
+    args = parser.parse_args()
+    spans = load_spans(args.trace_file, args.run)
+    if args.chrome:
+        write_chrome_trace(spans, args.chrome)
+        print(f"✅ Wrote {len(spans)} spans to {args.chrome}")
+    summarize(spans)
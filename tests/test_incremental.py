@@ -0,0 +1,74 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from modules import merge
+from modules.cache import flush_stores
+
+
+def make_clip(output_file, frames, frequency):
+    """Create a 30 fps H.264/AAC clip with a given number of frames."""
+    subprocess.run(
+        [
+            "ffmpeg", "-y", "-v", "error",
+            "-f", "lavfi", "-i", "testsrc2=size=320x240:rate=30",
+            "-f", "lavfi", "-i", f"sine=frequency={frequency}:sample_rate=44100",
+            "-frames:v", str(frames), "-shortest",
+            "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+            "-c:a", "aac", "-ac", "2",
+            output_file,
+        ],
+        check=True,
+    )
+
+
+def count_frames(video_file):
+    """Return the number of decoded video frames in a file."""
+    result = subprocess.run(
+        [
+            "ffprobe", "-v", "error", "-select_streams", "v:0", "-count_frames",
+            "-show_entries", "stream=nb_read_frames", "-of", "csv=p=0", video_file,
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return int(result.stdout.strip())
+
+
+@unittest.skipUnless(shutil.which("ffmpeg") and shutil.which("ffprobe"), "ffmpeg is not installed")
+class ExtractSegmentTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.work_dir = tempfile.mkdtemp()
+        os.chdir(self.work_dir)  # Keep the probe and hash caches out of the repository
+
+    def tearDown(self):
+        flush_stores()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.work_dir)
+
+    def test_segment_boundary_off_the_millisecond(self):
+        # 31 frames at 30 fps end at 1.0333...s, which no millisecond value hits exactly
+        clips = [os.path.abspath(f"clip_{i}.mp4") for i in range(3)]
+        frames = [31, 40, 29]
+        for clip, count, frequency in zip(clips, frames, (440, 660, 880)):
+            make_clip(clip, count, frequency)
+        output_file = os.path.abspath("article.mp4")
+        self.assertTrue(merge.concatenate_copy(clips, output_file, "test"))
+        merge.write_build_record(output_file, clips, clips)
+
+        with open(merge.build_record_path(output_file), "r") as f:
+            segments = json.load(f)["segments"]
+        self.assertNotAlmostEqual(segments[1]["start"], round(segments[1]["start"], 3), places=6)
+        for i, (segment, count) in enumerate(zip(segments, frames)):
+            segment_file = os.path.abspath(f"segment_{i}.mp4")
+            self.assertTrue(merge.extract_segment(output_file, segment, segment_file))
+            self.assertEqual(count_frames(segment_file), count)
+
+
+if __name__ == "__main__":
+    unittest.main()